@@ -1,187 +1,392 @@
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
-import json
-import logging
-import os
-from bot_engine import TradingBotEngine
-
-logging.basicConfig(
-    level=logging.DEBUG, # Changed to DEBUG for more verbose logging
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
-
-config_file = 'config.json'
-bot_engine = None
-
-def load_config():
-    with open(config_file, 'r') as f:
-        return json.load(f)
-
-def save_config(config):
-    with open(config_file, 'w') as f:
-        json.dump(config, f, indent=2)
-
-def emit_to_client(event, data):
-    socketio.emit(event, data)
-
-@app.route('/favicon.ico')
-def favicon():
-    return app.send_static_file('favicon.ico')
-
-@app.before_request
-def log_config_on_request():
-    if request.path.startswith('/api/config'):
-        config = load_config()
-
-@app.route('/')
-def index():
-    return render_template('dashboard.html')
-
-@app.route('/api/config', methods=['GET'])
-def get_config():
-    config = load_config()
-    return jsonify(config)
-
-@app.route('/api/config', methods=['POST'])
-def update_config():
-    global bot_engine
-    
-    try:
-        new_config = request.json
-        if 'active_strategy' in new_config:
-            del new_config['active_strategy']
-        if 'target_order_amount' in new_config: # Remove old parameter if present
-            del new_config['target_order_amount']
-        
-        if bot_engine and bot_engine.is_running:
-            return jsonify({'success': False, 'message': 'Please stop the bot before updating configuration'}), 400
-        
-        save_config(new_config)
-        
-        return jsonify({'success': True, 'message': 'Configuration updated successfully'})
-    
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
-
-@app.route('/api/status', methods=['GET'])
-def get_status():
-    if not bot_engine:
-        return jsonify({
-            'running': False,
-            'balance': 0.0,
-            'open_trades': [],
-            'in_position': False,
-            'position_entry_price': 0.0,
-            'position_qty': 0.0,
-            'current_take_profit': 0.0,
-            'current_stop_loss': 0.0
-        })
-    
-    return jsonify({
-        'running': bot_engine.is_running,
-        'balance': bot_engine.current_balance,
-        'open_trades': bot_engine.open_trades,
-        'in_position': bot_engine.in_position,
-        'position_entry_price': bot_engine.position_entry_price,
-        'position_qty': bot_engine.position_qty,
-        'current_take_profit': bot_engine.current_take_profit,
-        'current_stop_loss': bot_engine.current_stop_loss
-    })
-
-@socketio.on('connect')
-def handle_connect(sid): # Add sid argument
-    logging.info(f'Client connected: {sid}')
-    emit('connection_status', {'connected': True}, room=sid) # Emit to specific client
-    
-    if bot_engine:
-        emit('bot_status', {'running': bot_engine.is_running}, room=sid)
-        emit('balance_update', {'balance': bot_engine.current_balance}, room=sid)
-        emit('trades_update', {'trades': bot_engine.open_trades}, room=sid)
-        # Removed emit('stats_update', bot_engine.get_stats()) as get_stats() is not implemented
-        # Emit current position data
-        emit('position_update', {
-            'in_position': bot_engine.in_position,
-            'position_entry_price': bot_engine.position_entry_price,
-            'position_qty': bot_engine.position_qty,
-            'current_take_profit': bot_engine.current_take_profit,
-            'current_stop_loss': bot_engine.current_stop_loss
-        }, room=sid)
-        
-        for log in list(bot_engine.console_logs):
-            emit('console_log', log, room=sid)
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    logging.info('Client disconnected')
-
-@socketio.on('start_bot')
-def handle_start_bot():
-    global bot_engine
-    print("--- DEBUG: handle_start_bot called ---", flush=True)
-    
-    try:
-        config = load_config() # This is line 111
-        
-        if bot_engine and bot_engine.is_running:
-            emit('error', {'message': 'Bot is already running'})
-            return
-        
-        try:
-            bot_engine = TradingBotEngine(config_file, emit_to_client) # Pass config_file
-            bot_engine.start()
-            
-            # The bot_engine itself will emit status and success messages
-        except Exception as e:
-            logging.error(f'Error during bot_engine instantiation or start: {str(e)}', exc_info=True)
-            emit('error', {'message': f'Failed to start bot: {str(e)}'})
-    except Exception as e: # Catch errors from load_config()
-        logging.error(f'Error loading configuration in handle_start_bot: {str(e)}', exc_info=True)
-        emit('error', {'message': f'Failed to start bot due to config error: {str(e)}'})
-
-@socketio.on('stop_bot')
-def handle_stop_bot():
-    global bot_engine
-    
-    try:
-        if not bot_engine or not bot_engine.is_running:
-            emit('error', {'message': 'Bot is not running'})
-            return
-        
-        bot_engine.stop()
-        
-        # The bot_engine itself will emit status and success messages
-    
-    except Exception as e:
-        logging.error(f'Error stopping bot: {str(e)}')
-        emit('error', {'message': f'Failed to stop bot: {str(e)}'})
-
-@socketio.on('clear_console')
-def handle_clear_console():
-    if bot_engine:
-        bot_engine.console_logs.clear()
-    emit('console_cleared', {})
-
-@socketio.on('batch_modify_tpsl')
-def handle_batch_modify_tpsl():
-    global bot_engine
-    if bot_engine:
-        bot_engine.batch_modify_tpsl()
-    else:
-        emit('error', {'message': 'Bot is not running.'})
-
-@socketio.on('batch_cancel_orders')
-def handle_batch_cancel_orders():
-    global bot_engine
-    if bot_engine:
-        bot_engine.batch_cancel_orders()
-    else:
-        emit('error', {'message': 'Bot is not running.'})
-
-
-if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=False, use_reloader=False, log_output=True, allow_unsafe_werkzeug=True)
-
+# gevent must patch the stdlib before anything (including bot_engine) imports socket/ssl/threading
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Blueprint, Flask, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from flask_socketio import SocketIO, emit
+import logging
+import os
+import orjson
+import fastjsonschema
+import itertools
+import threading
+from collections import deque
+from bot_engine import TradingBotEngine, create_http_session
+
+logging.basicConfig(
+    level=logging.DEBUG if os.environ.get('BOT_DEBUG') else logging.INFO, # Set BOT_DEBUG=1 for verbose logging
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+class OrjsonSocketIOCodec:
+    # python-socketio expects a json-module-like object whose dumps() returns str
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
+# Payloads above compression_threshold bytes are deflated; small frames go out as-is
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent', json=OrjsonSocketIOCodec,
+                    http_compression=True, compression_threshold=512)
+
+config_file = 'config.json'
+
+# One keep-alive connection pool for the exchange REST API, shared across bot restarts
+http_session = create_http_session(pool_connections=32, pool_maxsize=32)
+
+# Shape of config.json accepted from the dashboard; compiled once into a specialized validator
+CONFIG_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'okx_api_key': {'type': 'string'},
+        'okx_api_secret': {'type': 'string'},
+        'okx_passphrase': {'type': 'string'},
+        'use_testnet': {'type': 'boolean'},
+        'symbol': {'type': 'string', 'minLength': 1},
+        'short_safety_line_price': {'type': 'number'},
+        'long_safety_line_price': {'type': 'number'},
+        'leverage': {'type': 'integer', 'minimum': 1},
+        'max_allowed_used': {'type': 'number', 'minimum': 0},
+        'entry_price_offset': {'type': 'number'},
+        'batch_offset': {'type': 'number'},
+        'tp_price_offset': {'type': 'number'},
+        'sl_price_offset': {'type': 'number'},
+        'loop_time_seconds': {'type': 'number', 'exclusiveMinimum': 0},
+        'rate_divisor': {'type': 'number', 'exclusiveMinimum': 0},
+        'batch_size_per_loop': {'type': 'integer', 'minimum': 1},
+        'min_order_amount': {'type': 'number', 'minimum': 0},
+        'target_order_amount': {'type': 'number', 'exclusiveMinimum': 0},
+        'cancel_unfilled_seconds': {'type': 'number', 'minimum': 0},
+        'cancel_on_tp_price_below_market': {'type': 'boolean'},
+        'cancel_on_entry_price_below_market': {'type': 'boolean'}
+    },
+    'required': [
+        'okx_api_key', 'okx_api_secret', 'okx_passphrase', 'use_testnet', 'symbol',
+        'short_safety_line_price', 'long_safety_line_price', 'leverage',
+        'entry_price_offset', 'batch_offset', 'tp_price_offset', 'sl_price_offset',
+        'loop_time_seconds', 'rate_divisor', 'batch_size_per_loop', 'min_order_amount',
+        'target_order_amount', 'cancel_unfilled_seconds'
+    ]
+}
+validate_config = fastjsonschema.compile(CONFIG_SCHEMA)
+
+# Newest console lines replayed to a client on connect
+CONSOLE_REPLAY_LIMIT = 200
+
+# Parsed config.json, reused for as long as the file's mtime is unchanged
+_config_cache = {'mtime': 0, 'data': None}
+# Read-only descriptor kept open on config.json; re-opened when the file is replaced
+_config_fd = None
+
+def _reopen_config_fd():
+    global _config_fd
+    if _config_fd is not None:
+        os.close(_config_fd)
+    _config_fd = os.open(config_file, os.O_RDONLY)
+
+def load_config():
+    stat = os.stat(config_file)
+    if _config_cache['data'] is not None and _config_cache['mtime'] == stat.st_mtime_ns:
+        return _config_cache['data']
+
+    # save_config and most editors swap in a new inode, leaving our descriptor on the old file
+    if _config_fd is None or os.fstat(_config_fd).st_ino != stat.st_ino:
+        _reopen_config_fd()
+    size = os.fstat(_config_fd).st_size
+    config = orjson.loads(os.pread(_config_fd, size, 0))
+    _config_cache['mtime'] = stat.st_mtime_ns
+    _config_cache['data'] = config
+    return config
+
+def save_config(config):
+    data = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    # Serialize fully in memory, write once, then swap the file in atomically
+    tmp_file = config_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, config_file)
+    _reopen_config_fd()
+    _config_cache['mtime'] = os.fstat(_config_fd).st_mtime_ns
+    _config_cache['data'] = config
+
+# Engine emits are queued and flushed as one 'batch' frame per interval
+EMIT_FLUSH_INTERVAL_SECONDS = 0.02
+_pending_emits = deque()
+
+def emit_to_client(event, data):
+    _pending_emits.append((event, data))
+
+def flush_pending_emits():
+    while True:
+        socketio.sleep(EMIT_FLUSH_INTERVAL_SECONDS)
+        if not _pending_emits:
+            continue
+        events = []
+        try:
+            while True:
+                events.append(_pending_emits.popleft())
+        except IndexError:
+            pass
+        socketio.emit('batch', {'events': events})
+
+socketio.start_background_task(flush_pending_emits)
+
+@app.route('/')
+def index():
+    return render_template('dashboard.html')
+
+# JSON API; hooks registered on the blueprint only run for /api requests
+api = Blueprint('api', __name__, url_prefix='/api')
+
+@api.before_request
+def log_api_request():
+    logger.debug('API request: %s %s', request.method, request.path)
+
+@api.route('/config', methods=['GET'])
+def get_config():
+    config = load_config()
+    return jsonify(config)
+
+# Status reported while no engine has been created yet
+IDLE_STATUS_JSON = orjson.dumps({
+    'running': False,
+    'balance': 0.0,
+    'open_trades': [],
+    'in_position': False,
+    'position_entry_price': 0.0,
+    'position_qty': 0.0,
+    'current_take_profit': 0.0,
+    'current_stop_loss': 0.0
+})
+
+class BotSupervisor:
+    """Owns the (possibly not yet created) TradingBotEngine on behalf of the routes and socket handlers."""
+
+    def __init__(self, config_path, emit_callback, session):
+        self.config_path = config_path
+        self.emit_callback = emit_callback
+        self.session = session
+        self._engine = None
+        # Serializes check-then-create/stop of the engine so concurrent starts can't leak one
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        engine = self._engine
+        return engine is not None and engine.is_running
+
+    def start(self):
+        """Create and start a fresh engine. Returns False if one is already running."""
+        with self._lock:
+            if self.is_running:
+                return False
+            self._engine = TradingBotEngine(self.config_path, self.emit_callback, session=self.session)
+            self._engine.start()
+            return True
+
+    def stop(self):
+        """Stop the running engine. Returns False if there was nothing to stop."""
+        with self._lock:
+            if not self.is_running:
+                return False
+            self._engine.stop()
+            return True
+
+    def status_json(self):
+        engine = self._engine
+        if engine is None:
+            return IDLE_STATUS_JSON
+        # The engine hands back pre-serialized bytes that only change when its status does
+        return engine.get_status_json()
+
+    def _console_logs_after(self, engine, last_seq):
+        # Seqs in the buffer are contiguous, so the entries newer than last_seq are simply its tail
+        with engine.snapshot_lock:
+            logs = engine.console_logs
+            if not logs:
+                return []
+            newest_seq = logs[-1].seq
+            if last_seq is None or last_seq > newest_seq: # Unknown or from a previous server process
+                count = len(logs)
+            else:
+                count = min(newest_seq - last_seq, len(logs))
+            count = min(count, CONSOLE_REPLAY_LIMIT)
+            return [entry.to_dict() for entry in itertools.islice(logs, len(logs) - count, None)]
+
+    def initial_state(self, last_seq=None):
+        state = {'connected': True}
+        engine = self._engine
+        if engine is None:
+            return state
+
+        logs = self._console_logs_after(engine, last_seq)
+        with engine.snapshot_lock:
+            open_trades = list(engine.open_trades)
+
+        state.update({
+            'bot_status': {'running': engine.is_running},
+            'balance': engine.current_balance,
+            'trades': open_trades,
+            'position': {
+                'in_position': engine.in_position,
+                'position_entry_price': engine.position_entry_price,
+                'position_qty': engine.position_qty,
+                'current_take_profit': engine.current_take_profit,
+                'current_stop_loss': engine.current_stop_loss
+            },
+            'logs': logs
+        })
+        return state
+
+    def clear_console(self):
+        engine = self._engine
+        if engine is not None:
+            with engine.snapshot_lock:
+                engine.console_logs.clear()
+
+    def batch_modify_tpsl(self):
+        """Returns False if there is no engine to act on."""
+        engine = self._engine
+        if engine is None:
+            return False
+        engine.batch_modify_tpsl()
+        return True
+
+    def batch_cancel_orders(self):
+        """Returns False if there is no engine to act on."""
+        engine = self._engine
+        if engine is None:
+            return False
+        engine.batch_cancel_orders()
+        return True
+
+supervisor = BotSupervisor(config_file, emit_to_client, http_session)
+
+@api.route('/config', methods=['POST'])
+def update_config():
+    try:
+        new_config = request.json
+        new_config.pop('active_strategy', None)
+        
+        if supervisor.is_running:
+            return jsonify({'success': False, 'message': 'Please stop the bot before updating configuration'}), 400
+        
+        try:
+            validate_config(new_config)
+        except fastjsonschema.JsonSchemaException as e:
+            return jsonify({'success': False, 'message': f'Invalid configuration: {e.message}'}), 400
+
+        save_config(new_config)
+        
+        return jsonify({'success': True, 'message': 'Configuration updated successfully'})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@api.route('/status', methods=['GET'])
+def get_status():
+    return Response(supervisor.status_json(), mimetype='application/json')
+
+# Plain-HTTP equivalents of the start_bot/stop_bot socket events, for scripts and automation
+# that shouldn't need a Socket.IO handshake; errors during start-up are broadcast to dashboards
+@api.route('/start_bot', methods=['POST'])
+def start_bot():
+    if supervisor.is_running:
+        return jsonify({'success': False, 'message': 'Bot is already running'}), 409
+
+    socketio.start_background_task(_start_bot_impl, None)
+    return jsonify({'success': True, 'message': 'Bot is starting'}), 202
+
+@api.route('/stop_bot', methods=['POST'])
+def stop_bot():
+    if not supervisor.is_running:
+        return jsonify({'success': False, 'message': 'Bot is not running'}), 409
+
+    socketio.start_background_task(_stop_bot_impl, None)
+    return jsonify({'success': True, 'message': 'Bot is stopping'}), 202
+
+app.register_blueprint(api)
+
+@socketio.on('connect')
+def handle_connect(auth):
+    logger.info('Client connected: %s', request.sid)
+    last_seq = auth.get('last_seq') if isinstance(auth, dict) else None
+    # Everything a fresh client needs goes out as one frame
+    emit('initial_state', supervisor.initial_state(last_seq))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    logger.info('Client disconnected')
+
+def _start_bot_impl(sid):
+    try:
+        if not supervisor.start():
+            socketio.emit('error', {'message': 'Bot is already running'}, to=sid)
+        # The bot_engine itself will emit status and success messages
+    except Exception as e:
+        logger.error('Error during bot_engine instantiation or start: %s', e, exc_info=True)
+        socketio.emit('error', {'message': f'Failed to start bot: {str(e)}'}, to=sid)
+
+def _stop_bot_impl(sid):
+    try:
+        if not supervisor.stop():
+            socketio.emit('error', {'message': 'Bot is not running'}, to=sid)
+        # The bot_engine itself will emit status and success messages
+    except Exception as e:
+        logger.error('Error stopping bot: %s', e)
+        socketio.emit('error', {'message': f'Failed to stop bot: {str(e)}'}, to=sid)
+
+@socketio.on('start_bot')
+def handle_start_bot():
+    logger.debug('handle_start_bot called')
+
+    if supervisor.is_running:
+        emit('error', {'message': 'Bot is already running'})
+        return
+
+    # Engine start-up does blocking exchange I/O; keep it off the handler. Config errors
+    # surface from engine construction there and are reported to this client
+    socketio.start_background_task(_start_bot_impl, request.sid)
+
+@socketio.on('stop_bot')
+def handle_stop_bot():
+    if not supervisor.is_running:
+        emit('error', {'message': 'Bot is not running'})
+        return
+
+    socketio.start_background_task(_stop_bot_impl, request.sid)
+
+@socketio.on('clear_console')
+def handle_clear_console():
+    supervisor.clear_console()
+    emit('console_cleared', {})
+
+@socketio.on('batch_modify_tpsl')
+def handle_batch_modify_tpsl():
+    if not supervisor.batch_modify_tpsl():
+        emit('error', {'message': 'Bot is not running.'})
+
+@socketio.on('batch_cancel_orders')
+def handle_batch_cancel_orders():
+    if not supervisor.batch_cancel_orders():
+        emit('error', {'message': 'Bot is not running.'})
+
+
+if __name__ == '__main__':
+    socketio.run(app, host='0.0.0.0', port=5000, debug=False, use_reloader=False, log_output=True)
+
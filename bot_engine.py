@@ -1,19 +1,28 @@
-import json
+import orjson
 import time
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
 import websocket # The 'websocket-client' package provides the 'websocket' module
 import ta
 import threading
+import itertools
 from collections import deque
 import os # Added for file path operations
 import requests
-import hashlib
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hmac
 import base64
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
 import _thread
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional
+from types import MappingProxyType
 
 # Global variables for OKX API configuration
 server_time_offset = 0
@@ -21,334 +30,421 @@ okx_simulated_trading_header = {}
 okx_api_key = ""
 okx_api_secret = ""
 okx_passphrase = ""
+# okx_api_secret encoded once per credential change rather than on every signature
+_secret_bytes = b""
 okx_rest_api_base_url = "https://www.okx.com"
 
-# Placeholder for PRODUCT_INFO, will be populated by fetch_product_info
-PRODUCT_INFO = {
-    "pricePrecision": None,
-    "qtyPrecision": None,
-    "priceTickSize": None,
-    "minOrderQty": None,
-    "contractSize": None,
-}
+# Historical candle windows fetched in parallel; each worker paces itself so the
+# pool stays under history-candles' limit of 20 requests per 2 seconds
+HISTORY_FETCH_CONCURRENCY = 5
+HISTORY_WINDOW_PACING_SECONDS = 0.5
 
-def safe_float(value, default=0.0):
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return default
+# Independent REST lookups run side by side (account poll, dashboard actions). Kept apart from each
+# engine's _rest_exec, which runs the scheduled SL/TP/fill callbacks, so neither waits on the other;
+# process-wide and never shut down, so it outlives engine restarts
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="okx-io")
 
-def get_okx_server_time_and_offset(log_callback):
-    global server_time_offset
-    try:
-        response = requests.get(f"{okx_rest_api_base_url}/api/v5/public/time", timeout=5)
-        response.raise_for_status()
-        json_response = response.json()
-        if json_response.get('code') == '0' and json_response.get('data'):
-            server_timestamp_ms = int(json_response['data'][0]['ts'])
-            local_timestamp_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
-            server_time_offset = server_timestamp_ms - local_timestamp_ms
-            log_callback(f"OKX server time synchronized. Offset: {server_time_offset}ms", level="info")
-            return True
-        else:
-            log_callback(f"Failed to get OKX server time: {json_response.get('msg', 'Unknown error')}", level="error")
-            return False
-    except requests.exceptions.RequestException as e:
-        log_callback(f"Error fetching OKX server time: {e}", level="error")
-        return False
-    except Exception as e:
-        log_callback(f"Unexpected error in get_okx_server_time_and_offset: {e}", level="error")
-        return False
+def create_http_session(pool_connections=10, pool_maxsize=20):
+    """Keep-alive session for the OKX REST API.
 
-def generate_okx_signature(timestamp, method, request_path, body_str=''):
+    The adapter only retries failed connects (e.g. a pooled connection the server already closed),
+    which never reach OKX and so are safe even for order POSTs; everything else is left to the
+    request helpers' own retry loop.
     """
-    Generate HMAC SHA256 signature for OKX API.
-    Returns Base64-encoded HMAC-SHA256 digest.
-    """
-    message = str(timestamp) + method.upper() + request_path + body_str
-    hashed = hmac.new(okx_api_secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha256)
-    signature = base64.b64encode(hashed.digest()).decode('utf-8')
-    return signature
-
-def okx_request(method, path, params=None, body_dict=None, max_retries=3, log_callback=None):
-    local_dt = datetime.now(timezone.utc)
-    adjusted_dt = local_dt + timedelta(milliseconds=server_time_offset)
-    timestamp = adjusted_dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-
-    body_str = ''
-    if body_dict:
-        body_str = json.dumps(body_dict, separators=(',', ':'), sort_keys=True)
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+    retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2, raise_on_status=False)
+    session.mount('https://', HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry))
+    return session
 
-    request_path_for_signing = path
-    final_url = f"{okx_rest_api_base_url}{path}" 
+# Shared by the module-level helpers and any engine created without its own session
+http_session = create_http_session()
 
-    if params and method.upper() == 'GET':
-        query_string = '?' + '&'.join([f'{k}={v}' for k, v in sorted(params.items())])
-        request_path_for_signing += query_string
-        final_url += query_string
+# Banner line around multi-line log blocks
+_SEP = "=" * 80
 
-    signature = generate_okx_signature(timestamp, method, request_path_for_signing, body_str)
+# Process-wide console log sequence so numbers keep increasing across engine restarts
+console_log_seq = itertools.count(1)
 
-    headers = {
-        "OK-ACCESS-KEY": okx_api_key,
-        "OK-ACCESS-SIGN": signature,
-        "OK-ACCESS-TIMESTAMP": timestamp,
-        "OK-ACCESS-PASSPHRASE": okx_passphrase,
-        "Content-Type": "application/json"
-    }
-
-    headers.update(okx_simulated_trading_header)
+# Placeholder for PRODUCT_INFO, will be populated by fetch_product_info. Read-only view: a fetch
+# publishes a new mapping by rebinding the name, so readers never see a half-updated spec
+PRODUCT_INFO = MappingProxyType({
+    "pricePrecision": None,
+    "qtyPrecision": None,
+    "priceTickSize": None,
+    "minOrderQty": None,
+    "contractSize": None,
+    # printf-style templates bound to the precisions above, rebuilt whenever they change;
+    # "fmt % x" is a single C-level call, unlike str.format's per-call format-spec parsing
+    "priceFmt": "%.4f",
+    "qtyFmt": "%.8f",
+})
+
+def set_number_formats(info):
+    """(Re)build info's priceFmt/qtyFmt from its pricePrecision/qtyPrecision."""
+    info['priceFmt'] = "%%.%df" % info['pricePrecision']
+    info['qtyFmt'] = "%%.%df" % info['qtyPrecision']
+
+# Instrument specs barely change; reuse a symbol's fetched PRODUCT_INFO across restarts for an hour
+PRODUCT_CACHE_TTL_SECONDS = 3600
+_PRODUCT_CACHE = {}
+# ...and across process restarts for a day, via a small JSON file per symbol
+PRODUCT_DISK_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.bot_cache')
+PRODUCT_DISK_CACHE_TTL_SECONDS = 86400
+
+def _product_disk_cache_path(symbol):
+    return os.path.join(PRODUCT_DISK_CACHE_DIR, f"instruments_SWAP_{symbol}.json")
+
+# Fields a cached spec must carry to be usable; priceFmt/qtyFmt are rebuilt from the precisions
+_PRODUCT_DISK_CACHE_REQUIRED = ('pricePrecision', 'qtyPrecision', 'priceTickSize', 'minOrderQty')
+
+def _valid_product_disk_info(info):
+    if not isinstance(info, dict):
+        return False
+    for key in _PRODUCT_DISK_CACHE_REQUIRED:
+        value = info.get(key)
+        if type(value) not in (int, float) or (key.endswith('Precision') and type(value) is not int):
+            return False
+    return True
 
-    for attempt in range(max_retries):
+def load_product_disk_cache(symbol):
+    """Cached PRODUCT_INFO fields for symbol if saved less than a day ago, else None.
+    A stale or malformed file is deleted so the caller falls through to REST and rewrites it."""
+    path = _product_disk_cache_path(symbol)
+    try:
+        with open(path, 'rb') as f:
+            entry = orjson.loads(f.read())
+    except OSError:
+        return None
+    except orjson.JSONDecodeError:
+        entry = None
+    info = entry.get('info') if isinstance(entry, dict) else None
+    saved_at = entry.get('saved_at') if isinstance(entry, dict) else None
+    if not isinstance(saved_at, (int, float)) or time.time() - saved_at >= PRODUCT_DISK_CACHE_TTL_SECONDS \
+            or not _valid_product_disk_info(info):
         try:
-            req_func = getattr(requests, method.lower(), None)
-            if not req_func:
-                if log_callback: log_callback(f"Unsupported HTTP method: {method}", level="error")
-                return None
-
-            kwargs = {'headers': headers, 'timeout': 15}
-
-            if body_dict and method.upper() in ['POST', 'PUT', 'DELETE']:
-                kwargs['data'] = body_str
-
-            if log_callback: log_callback(f"{method} {path} (Attempt {attempt + 1}/{max_retries})", level="info")
-            response = req_func(final_url, **kwargs)
-
-            if response.status_code != 200:
-                try:
-                    error_json = response.json()
-                    if log_callback: log_callback(f"API Error: Status={response.status_code}, Code={error_json.get('code')}, Msg={error_json.get('msg')}", level="error")
-                    okx_error_code = error_json.get('code')
-                    if okx_error_code:
-                        return error_json
-                except json.JSONDecodeError:
-                    if log_callback: log_callback(f"API Error: Status={response.status_code}, Response: {response.text[:200]}", level="error")
-
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-                    continue
-                return None
-
-            try:
-                json_response = response.json()
-                if json_response.get('code') != '0':
-                    if log_callback: log_callback(f"OKX API returned non-zero code: {json_response.get('code')} Msg: {json_response.get('msg')} for {method} {path}. Full Response: {json_response}", level="warning")
-                return json_response
-            except json.JSONDecodeError:
-                if log_callback: log_callback(f"Failed to decode JSON for {method} {path}. Status: {response.status_code}, Resp: {response.text[:200]}", level="error")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-                    continue
-                return None
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return info
 
-        except requests.exceptions.Timeout:
-            if log_callback: log_callback(f"API request timeout (Attempt {attempt + 1}/{max_retries})", level="error")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-            return None
-        except requests.exceptions.RequestException as e:
-            status_code = e.response.status_code if e.response is not None else "N/A"
-            err_text = e.response.text[:200] if e.response is not None else 'No response text'
-            if log_callback: log_callback(f"OKX API HTTP Error ({method} {path}): Status={status_code}, Error={e}. Response: {err_text}", level="error")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-            return None
-        except Exception as e:
-            if log_callback: log_callback(f"Unexpected error during OKX API request ({method} {path}): {e}", level="error")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-            return None
-    return None
+def save_product_disk_cache(symbol, info):
+    os.makedirs(PRODUCT_DISK_CACHE_DIR, exist_ok=True)
+    tmp_path = _product_disk_cache_path(symbol) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps({'saved_at': time.time(), 'info': info}))
+    os.replace(tmp_path, _product_disk_cache_path(symbol)) # Readers never see a half-written file
 
-def fetch_historical_data_okx(symbol, timeframe, start_ts_ms, end_ts_ms, log_callback):
+def safe_float(value, default=0.0):
+    # Already-numeric values (most WS/REST callers) skip the exception handler entirely
+    value_type = type(value)
+    if value_type is float:
+        return value
+    if value_type is int:
+        return float(value)
     try:
-        path = "/api/v5/market/history-candles"
-
-        okx_timeframe_map = {
-            '1m': '1m', '3m': '3m', '5m': '5m', '15m': '15m', '30m': '30m',
-            '1h': '1H', '2h': '2H', '4h': '4H', '6h': '6H', '8h': '8H',
-            '12h': '12H', '1d': '1D', '1w': '1W', '1M': '1M'
-        }
-        okx_timeframe = okx_timeframe_map.get(timeframe)
+        return float(value)
+    except (ValueError, TypeError):
+        return default
 
-        if not okx_timeframe:
-            log_callback(f"Invalid timeframe for OKX: {timeframe}", level="error")
-            return []
+# Engine timeframe keys -> OKX 'bar' values
+_OKX_TF_MAP = {
+    '1m': '1m', '3m': '3m', '5m': '5m', '15m': '15m', '30m': '30m',
+    '1h': '1H', '2h': '2H', '4h': '4H', '6h': '6H', '8h': '8H',
+    '12h': '12H', '1d': '1D', '1w': '1W', '1M': '1M'
+}
 
-        all_data = []
-        max_candles_limit = 100
+# Bar length in seconds per engine timeframe key
+_INTERVALS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800,
+    '12h': 43200, '1d': 86400, '1w': 604800, '1M': 2592000
+}
+_INTERVAL_TO_TF = {v: k for k, v in _INTERVALS.items()}
+_INTERVALS_MS = {k: v * 1000 for k, v in _INTERVALS.items()}
 
-        current_before_ms = end_ts_ms
+# Compact, key-sorted encoding used for signed request bodies (bytes, ready to send)
+def _json_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
 
-        log_callback(f"Fetching historical data for {symbol} ({timeframe}) from {datetime.fromtimestamp(start_ts_ms/1000, tz=timezone.utc)} to {datetime.fromtimestamp(end_ts_ms/1000, tz=timezone.utc)}", level="info")
+# Text JSON for WebSocket frames, which websocket-client sends as str
+def _dumps(obj):
+    return orjson.dumps(obj).decode('utf-8')
 
-        while True:
-            params = {
-                "instId": symbol,
-                "bar": okx_timeframe,
-                "limit": str(max_candles_limit),
-                "before": str(current_before_ms)
-            }
+KLINE_COLUMNS = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
 
-            response = okx_request("GET", path, params=params, log_callback=log_callback)
-            
-            if response and response.get('code') == '0':
-                rows = response.get('data', [])
-                if rows:
-                    log_callback(f"Fetched {len(rows)} candles for {timeframe}", level="info")
-                    parsed_klines = []
-                    for kline in rows:
-                        try:
-                            parsed_klines.append([
-                                int(kline[0]),
-                                float(kline[1]),
-                                float(kline[2]),
-                                float(kline[3]),
-                                float(kline[4]),
-                                float(kline[5])
-                            ])
-                        except (ValueError, TypeError, IndexError) as e:
-                            log_callback(f"Error parsing OKX kline: {kline} - {e}", level="error")
-                            continue
-                    
-                    all_data.extend(parsed_klines)
-                    
-                    oldest_ts = int(rows[-1][0])
-                    current_before_ms = oldest_ts
-
-                    if oldest_ts <= start_ts_ms or len(rows) < max_candles_limit:
-                        break 
-                else:
-                    break 
-
-                time.sleep(0.3)
-            else:
-                log_callback(f"Error fetching OKX klines: {response}", level="error")
-                return []
-        
-        final_data = pd.DataFrame(all_data, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
-        if not final_data.empty:
-            final_data = final_data.drop_duplicates(subset=['Timestamp'])
-            final_data = final_data[final_data['Timestamp'] >= start_ts_ms]
-            final_data = final_data.sort_values(by='Timestamp', ascending=True)
-            return final_data.values.tolist()
-        else:
-            return []
-    except Exception as e:
-        log_callback(f"Exception in fetch_historical_data_okx: {e}", level="error")
-        return []
-
-def fetch_product_info(target_symbol, log_callback):
-    global PRODUCT_INFO
+def parse_kline_rows(rows, log_callback):
+    """Convert one page of OKX kline rows into an (n, 6) float64 array of ts/OHLCV."""
     try:
-        path = "/api/v5/public/instruments"
-        params = {"instType": "SWAP", "instId": target_symbol}
-        response = okx_request("GET", path, params=params, log_callback=log_callback)
-
-        if response and response.get('code') == '0':
-            product_data = None
-            if isinstance(response.get('data'), list):
-                for item in response['data']:
-                    if item.get('instId') == target_symbol:
-                        product_data = item
-                        break
-            elif isinstance(response.get('data'), dict) and response.get('data').get('instId') == target_symbol:
-                product_data = response.get('data')
+        return np.array(rows, dtype=object)[:, :6].astype(np.float64)
+    except (ValueError, TypeError, IndexError):
+        pass
 
-            if not product_data:
-                log_callback(f"Product {target_symbol} not found in OKX instruments response.", level="error")
-                return False
-
-            PRODUCT_INFO['priceTickSize'] = safe_float(product_data.get('tickSz'))
-            PRODUCT_INFO['qtyPrecision'] = int(np.abs(np.log10(safe_float(product_data.get('lotSz'))))) if safe_float(product_data.get('lotSz')) > 0 else 0
-            PRODUCT_INFO['pricePrecision'] = int(np.abs(np.log10(safe_float(product_data.get('tickSz'))))) if safe_float(product_data.get('tickSz')) > 0 else 0
-            PRODUCT_INFO['qtyStepSize'] = safe_float(product_data.get('lotSz'))
-            PRODUCT_INFO['minOrderQty'] = safe_float(product_data.get('minSz'))
-
-            PRODUCT_INFO['contractSize'] = safe_float(product_data.get('ctVal', '1'), 1.0)
-
-            log_callback(f"Product info loaded for {target_symbol}: {PRODUCT_INFO}", level="info")
-            return True
-        else:
-            log_callback(f"Failed to fetch product info for {target_symbol} (code: {response.get('code') if response else 'N/A'}, msg: {response.get('msg') if response else 'N/A'})", level="error")
-            return False
-    except Exception as e:
-        log_callback(f"Exception in fetch_product_info: {e}", level="error")
-        return False
-
-def okx_set_leverage(symbol, leverage_val, log_callback):
+    # A malformed row poisons the vectorized cast; fall back to dropping just the bad ones
+    parsed = []
+    for kline in rows:
+        try:
+            parsed.append([float(kline[i]) for i in range(6)])
+        except (ValueError, TypeError, IndexError) as e:
+            log_callback(f"Error parsing OKX kline: {kline} - {e}", level="error")
+    return np.array(parsed, dtype=np.float64).reshape(-1, 6)
+
+def group_by_inst(rows):
+    """instId -> rows for that instrument, keeping order (hedge mode returns a long and a short row)."""
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.get('instId'), []).append(row)
+    return grouped
+
+def pick_position_row(rows, pos_side='long'):
+    """The row for pos_side among one instrument's position rows. In long/short mode OKX sends a
+    row per side in no fixed order; in net mode (no matching posSide) take the non-flat row."""
+    fallback = None
+    for row in rows:
+        if row.get('posSide') == pos_side:
+            return row
+        if fallback is None and safe_float(row.get('pos', 0)) != 0:
+            fallback = row
+    return fallback if fallback is not None else rows[0]
+
+def finalize_klines(data, start_ts_ms):
+    """Keep candles from start_ts_ms on and drop duplicate timestamps from a filled kline buffer."""
+    data = data[data[:, 0] >= start_ts_ms]
+    # np.unique sorts its input, so the first-occurrence indices come back in timestamp order
+    _, first_idx = np.unique(data[:, 0], return_index=True)
+    return data[first_idx]
+
+def step_precision(step):
+    """Decimal places implied by an OKX step size such as '0.01' (2) or '0.5' (1); 0 for missing/whole steps."""
     try:
-        path = "/api/v5/account/set-leverage"
-        body = {
-            "instId": symbol,
-            "lever": str(int(leverage_val)),
-            "mgnMode": "cross"
-        }
+        exponent = Decimal(str(step)).normalize().as_tuple().exponent
+    except (InvalidOperation, TypeError, ValueError):
+        return 0
+    if not isinstance(exponent, int): # NaN/Infinity
+        return 0
+    return max(0, -exponent)
+
+def okx_timestamp():
+    """Current server-adjusted time as the ISO-8601 millisecond string OKX signs against."""
+    ms = int(time.time() * 1000) + server_time_offset
+    tm = time.gmtime(ms // 1000)
+    return f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}T{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}.{ms % 1000:03d}Z"
 
-        log_callback(f"Setting leverage to {leverage_val}x for {symbol}", level="info")
-        response = okx_request("POST", path, body_dict=body, log_callback=log_callback)
+def generate_okx_signature(timestamp, method, request_path, body_str=''):
+    """
+    Generate HMAC SHA256 signature for OKX API.
+    Returns Base64-encoded HMAC-SHA256 digest.
+    """
+    message = str(timestamp) + method.upper() + request_path + body_str
+    # One-shot C HMAC; beats copying a keyed hmac object for messages this short
+    digest = hmac.digest(_secret_bytes, message.encode('utf-8'), 'sha256')
+    signature = base64.b64encode(digest).decode('utf-8')
+    return signature
 
-        if response and response.get('code') == '0':
-            log_callback(f"Leverage set successfully for {symbol}", level="info")
-            return True
-        else:
-            log_callback(f"Failed to set leverage for {symbol}: {response.get('msg') if response else 'No response'}", level="error")
-            return False
-    except Exception as e:
-        log_callback(f"Exception in okx_set_leverage: {e}", level="error")
-        return False
+# Module-level helpers kept for external callers. The REST logic lives only on TradingBotEngine;
+# these delegate to the most recently created engine, which logs through its own console.
+_default_engine = None
 
-def get_current_market_price(symbol, log_callback):
-    try:
-        path = "/api/v5/market/ticker"
-        params = {"instId": symbol}
-        response = okx_request("GET", path, params=params, log_callback=log_callback)
+def _require_default_engine():
+    if _default_engine is None:
+        raise RuntimeError("No TradingBotEngine has been created yet")
+    return _default_engine
 
-        if response and response.get('code') == '0':
-            data = response.get('data', [])
-            if data and isinstance(data, list) and len(data) > 0:
-                ticker_info = data[0]
-                last_price = ticker_info.get('last')
-                if last_price is not None:
-                    current_price = safe_float(last_price)
-                    if log_callback: log_callback(f"Current market price (REST): ${current_price:.2f}", level="info")
-                    return current_price
-                else:
-                    if log_callback: log_callback("'last' price not found in OKX ticker response.", level="error")
-            else:
-                if log_callback: log_callback("OKX ticker data is empty or malformed.", level="error")
+def get_okx_server_time_and_offset(log_callback=None):
+    return _require_default_engine()._get_okx_server_time_and_offset()
 
-        if log_callback: log_callback("Failed to fetch current price from REST.", level="error")
-        return None
-    except Exception as e:
-        if log_callback: log_callback(f"Exception in get_current_market_price: {e}", level="error")
-        return None
+def okx_request(method, path, params=None, body_dict=None, max_retries=3, log_callback=None):
+    return _require_default_engine()._okx_request(method, path, params=params, body_dict=body_dict, max_retries=max_retries)
+
+def fetch_historical_data_okx(symbol, timeframe, start_ts_ms, end_ts_ms, log_callback=None):
+    data = _require_default_engine()._fetch_historical_data_okx(symbol, timeframe, start_ts_ms, end_ts_ms)
+    return data.tolist() if isinstance(data, np.ndarray) else data
+
+def fetch_product_info(target_symbol, log_callback=None):
+    return _require_default_engine()._fetch_product_info(target_symbol)
+
+def okx_set_leverage(symbol, leverage_val, log_callback=None):
+    return _require_default_engine()._okx_set_leverage(symbol, leverage_val)
+
+def get_current_market_price(symbol, log_callback=None):
+    return _require_default_engine()._get_current_market_price(symbol)
+
+# Most orders OKX accepts in one batch-orders / cancel-batch-orders request
+OKX_BATCH_LIMIT = 20
+# A positions push younger than this is trusted over a REST positions fetch. Confirmation runs
+# 2-5s after the fill push and OKX only pushes on change, so this must outlast that delay.
+POSITION_SNAPSHOT_MAX_AGE_SECONDS = 6.0
+
+# Private WS: ping after this much silence (OKX drops idle connections at 30s), and treat
+# pushed account data older than PRIVATE_WS_STALE_SECONDS as stale so the REST poll takes over
+PRIVATE_WS_PING_SECONDS = 20
+PRIVATE_WS_STALE_SECONDS = 30
+
+# Most algo orders OKX accepts in one cancel-algos request
+OKX_ALGO_BATCH_LIMIT = 10
+
+# Fixed fields of the TP/SL OCO exit order; callers add instId, side/posSide, sz and trigger prices
+_ALGO_BODY_BASE = {
+    "tdMode": "cross",
+    "ordType": "oco",
+    "tpOrdPx": "market",
+    "slOrdPx": "market",
+    "reduceOnly": "true",
+}
+
+# Candles kept per timeframe in the historical data store
+HISTORY_RING_CAPACITY = 1000
+
+class CandleRing:
+    """Fixed-capacity OHLCV history for one timeframe, overwritten in place as candles arrive."""
+    __slots__ = ('capacity', 'ts', 'ohlcv', 'head', 'size')
+
+    def __init__(self, capacity=HISTORY_RING_CAPACITY):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        # Fortran order keeps each OHLCV column contiguous for indicator reads
+        self.ohlcv = np.zeros((capacity, 5), dtype=np.float64, order='F')
+        self.head = 0 # Next slot to write
+        self.size = 0
+
+    def last_ts(self):
+        return int(self.ts[self.head - 1]) if self.size else None
+
+    def append(self, ts_ms, ohlcv):
+        self.ts[self.head] = ts_ms
+        self.ohlcv[self.head] = ohlcv
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def update_last(self, ohlcv):
+        self.ohlcv[self.head - 1] = ohlcv
+
+    def extend(self, rows):
+        """Bulk-append an ascending (n, 6) ts/OHLCV array; only the newest `capacity` rows survive."""
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.ts[slots] = rows[:, 0]
+        self.ohlcv[slots] = rows[:, 1:6]
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def to_frame(self):
+        order = (self.head - self.size + np.arange(self.size)) % self.capacity
+        index = pd.DatetimeIndex(pd.to_datetime(self.ts[order], unit='ms', utc=True), name='Datetime')
+        return pd.DataFrame(self.ohlcv[order], columns=KLINE_COLUMNS[1:], index=index)
+
+class ConsoleLogEntry:
+    """One line of the console buffer; turned into a dict only when it is sent to a client."""
+    __slots__ = ('seq', 'timestamp', 'message', 'level')
+
+    def __init__(self, seq, timestamp, message, level):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.message = message
+        self.level = level
+
+    def to_dict(self):
+        return {'seq': self.seq, 'timestamp': self.timestamp, 'message': self.message, 'level': self.level}
+
+@dataclass(frozen=True)
+class PositionState:
+    """Snapshot of the tracked position. Never mutated; a new one is swapped in under position_lock,
+    so readers can take self._position_state once and see consistent fields without the lock."""
+    in_position: bool = False
+    entry_price: float = 0.0
+    qty: float = 0.0
+    tp: float = 0.0
+    sl: float = 0.0
+    exit_orders: tuple = (None, None) # (sl_id, tp_id)
+    pending_id: Optional[str] = None
+    reduced_tp: bool = False
+
+_FLAT_POSITION = PositionState()
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """Balances from the latest account update. Replaced whole by a single attribute assignment,
+    so readers take self._account_snapshot once without a lock."""
+    total: float = 0.0
+    available: float = 0.0
+    ts: float = 0.0 # monotonic
+
+_EMPTY_ACCOUNT = AccountSnapshot()
+# pending_id while an entry cycle owns the slot but has not placed its order yet
+_ENTRY_SLOT_CLAIMED = "PENDING"
 
 class TradingBotEngine:
-    def __init__(self, config_path, emit_callback):
+    def __init__(self, config_path, emit_callback, session=None):
         self.config_path = config_path
         self.emit = emit_callback
+        # Resolved once: per-frame debug lines are only formatted/recorded when debug logging is on (BOT_DEBUG)
+        self._debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+        # Pooled HTTP session so REST calls reuse keep-alive connections
+        self.session = session if session is not None else http_session
         
         self.console_logs = deque(maxlen=500)
-        self.config = self._load_config()
+        # Guards console_logs/open_trades while the web layer snapshots them
+        self.snapshot_lock = threading.Lock()
+        # Read-only and never mutated after load, so every thread reads it without a lock
+        self.config = MappingProxyType(self._load_config())
+        self._sync_config_cache()
 
         # Initialize OKX API credentials globally
-        global okx_api_key, okx_api_secret, okx_passphrase, okx_simulated_trading_header
+        global okx_api_key, okx_api_secret, okx_passphrase, okx_simulated_trading_header, _secret_bytes, _default_engine
         okx_api_key = self.config['okx_api_key']
         okx_api_secret = self.config['okx_api_secret']
+        _secret_bytes = okx_api_secret.encode('utf-8')
         okx_passphrase = self.config['okx_passphrase']
         if self.config['use_testnet']:
             okx_simulated_trading_header = {'x-simulated-trading': '1'}
         else:
             okx_simulated_trading_header = {}
+        # Per-request signing headers minus the two that change every call (Content-Type comes from the session)
+        self._base_headers = {
+            "OK-ACCESS-KEY": okx_api_key,
+            "OK-ACCESS-PASSPHRASE": okx_passphrase,
+            **okx_simulated_trading_header
+        }
+        _default_engine = self
 
         self.ws = None
         self.ws_thread = None
+        # Private (logged-in) WS for account/positions/orders pushes
+        self.private_ws = None
+        self._private_ws_last_msg = 0.0 # monotonic
+        self._account_pushed_at = 0.0 # monotonic; 0 until the first account push
+        self._total_trades = 0
+        self._last_fill_bill_id = None # Fills cursor: each poll only asks for fills newer than this
+        # Outbound WS ops, merged per kind and sent together by _flush_ws_sends
+        self._ws_send_queue = deque()
+        self._ws_send_lock = threading.Lock()
         self.is_running = False
+        # Bumped whenever a field exposed by /api/status changes; keys the serialized status cache
+        self.status_version = 0
+        self._status_json_cache = None
         self.stop_event = threading.Event()
+        # Set on position/entry state transitions so the lifecycle manager reacts without polling
+        self._lifecycle_wakeup = threading.Event()
+        # Set when the bot becomes free to enter again (entry/position reset) or on stop
+        self._entry_wakeup = threading.Event()
+        # Set after order placement/cancel and position changes to refresh account info right away
+        self._account_refresh_event = threading.Event()
+        # ordId/algoId -> Event, registered by _expect_orders before a cancel/exit and set on its ack
+        self._order_events = {}
+        # Entry ordId whose fill confirmation is running; claimed under position_lock so the
+        # several fill pushes one order produces confirm (and place its OCO) only once
+        self._confirming_order_id = None
+        # Delayed callbacks (fill confirmation, SL/TP handling) are timed by one scheduler thread
+        # instead of a new Timer thread each; entries are (run_at, seq, fn)
+        self._scheduler_q = queue.PriorityQueue()
+        self._scheduler_seq = itertools.count()
+        self._scheduler_wakeup = threading.Event()
+        self._scheduler_thread = None
+        self.position_manager_thread = None
+        # Due callbacks run here, so a slow REST ack in one handler never delays the next deferral
+        self._rest_exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="okx-rest")
         
         self.current_balance = 0.0
         self.open_trades = []
@@ -359,22 +455,21 @@ class TradingBotEngine:
         # OKX specific variables (from example bot)
         self.historical_data_store = {}
         self.data_lock = threading.Lock()
-        self.trade_data_lock = threading.Lock()
-        self.latest_trade_price = None
-        self.latest_trade_timestamp = None
-        self.account_balance = 0.0
-        self.available_balance = 0.0
-        self.account_info_lock = threading.Lock()
-        self.in_position = False
-        self.position_entry_price = 0.0
-        self.position_qty = 0.0
-        self.current_stop_loss = 0.0
-        self.current_take_profit = 0.0
+        # (timestamp_ms, price) of the latest trade/ticker; replaced as a whole so readers never see a torn pair
+        self.latest_trade = (None, None)
+        # (monotonic_ts, price) of the last price seen for config symbol, from WS pushes or REST;
+        # one tuple so readers never see a price paired with another tick's timestamp
+        self._last_price = (0.0, None)
+        # instId -> (monotonic_ts, position row) from the last positions push; each entry replaced whole
+        self._ws_position_snapshot = {}
+        # (instType, instId) -> (monotonic_ts, positions response) shared by on-demand position readers
+        self._positions_cache = {}
+        # Swapped whole on each account update; see the account_balance/available_balance properties
+        self._account_snapshot = _EMPTY_ACCOUNT
+        # Writers hold position_lock and swap in a new PositionState; see the read-only properties below
+        self._position_state = _FLAT_POSITION
         self.position_lock = threading.Lock()
-        self.pending_entry_order_id = None
         self.pending_entry_order_details = {}
-        self.position_exit_orders = {}
-        self.entry_reduced_tp_flag = False
         self.entry_sl_price = 0.0
         self.sl_hit_triggered = False
         self.sl_hit_lock = threading.Lock()
@@ -387,23 +482,37 @@ class TradingBotEngine:
         self.ws_subscriptions_ready = threading.Event()
         self.pending_subscriptions = set()
         self.confirmed_subscriptions = set()
-
-        self.intervals = {
-            '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
-            '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800,
-            '12h': 43200, '1d': 86400, '1w': 604800, '1M': 2592000
+        # Subscribe acks still outstanding; the sets above are kept for logging
+        self._pending_ack_count = 0
+
+        self.intervals = _INTERVALS
+        self.interval_to_timeframe_str = _INTERVAL_TO_TF
+
+        # Channel name -> handler for WS data frames
+        self._ws_handlers = {
+            'trades': self._handle_trades_msg,
+            'tickers': self._handle_tickers_msg,
+            'positions': self._handle_positions_msg,
+            'account': self._handle_account_msg,
+            'orders': self._handle_order_update,
+            'orders-algo': self._handle_order_update,
         }
-        self.interval_to_timeframe_str = {v: k for k, v in self.intervals.items()}
         
-    def log(self, message, level='info', to_file=False, filename=None):
+    def log(self, message, *args, level='info', to_file=False, filename=None):
+        """Record a console line; %-style args are only interpolated when the line is kept."""
+        if level == 'debug' and not self._debug_enabled:
+            return
+        if args:
+            message = message % args
         timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = {'timestamp': timestamp, 'message': message, 'level': level}
         # Always append to console_logs for internal history, but filter what gets emitted to frontend
-        self.console_logs.append(log_entry)
+        with self.snapshot_lock:
+            log_entry = ConsoleLogEntry(next(console_log_seq), timestamp, message, level)
+            self.console_logs.append(log_entry)
         
         # Only emit info, warning, and error levels to the frontend
         if level in ['info', 'warning', 'error']:
-            self.emit('console_log', log_entry)
+            self.emit('console_log', log_entry.to_dict())
         
         # Always write to the local log file based on level
         if level == 'info':
@@ -417,146 +526,337 @@ class TradingBotEngine:
     
     def start(self):
         if self.is_running:
-            self.log('Bot is already running', 'warning')
+            self.log('Bot is already running', level='warning')
             return
         
         self.is_running = True
-        self.log('Bot starting...', 'info')
+        self._mark_status_changed()
+        self.log('Bot starting...', level='info')
         
         # New initialization sequence for OKX
-        if not get_okx_server_time_and_offset(self.log):
-            self.log("Failed to synchronize server time. Please check network connection or API.", 'error')
+        if not self._get_okx_server_time_and_offset():
+            self.log("Failed to synchronize server time. Please check network connection or API.", level='error')
             self.is_running = False
+            self._mark_status_changed()
             self.emit('bot_status', {'running': False})
             return
         
-        if not fetch_product_info(self.config['symbol'], self.log):
-            self.log("Failed to fetch product info. Exiting.", 'error')
+        if not self._fetch_product_info(self._symbol):
+            self.log("Failed to fetch product info. Exiting.", level='error')
             self.is_running = False
+            self._mark_status_changed()
             self.emit('bot_status', {'running': False})
             return
  
-        if not okx_set_leverage(self.config['symbol'], self.config['leverage'], self.log):
-            self.log("Failed to set leverage. Exiting.", 'error')
+        if not self._okx_set_leverage(self._symbol, self.config['leverage']):
+            self.log("Failed to set leverage. Exiting.", level='error')
             self.is_running = False
+            self._mark_status_changed()
             self.emit('bot_status', {'running': False})
             return
         
         self.log("Checking for and closing any existing open positions...", level="info")
         self._check_and_close_any_open_position()
 
-        self.log('Bot initialized. Starting live trading connection...', 'info')
+        self._scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
+        self._scheduler_thread.start()
+
+        # Account, position and order state arrive as pushes. Started once here, outside the public
+        # WS reconnect path; the private socket reconnects itself via _on_private_ws_close
+        self._start_private_websocket()
+        threading.Thread(target=self._private_ws_watchdog, name="OKXPrivateWSWatchdog", daemon=True).start()
+
+        self.log('Bot initialized. Starting live trading connection...', level='info')
         self.ws_thread = threading.Thread(target=self._initialize_websocket_and_start_main_loop, daemon=True)
         self.ws_thread.start()
     
     def stop(self):
         if not self.is_running:
-            self.log('Bot is not running', 'warning')
+            self.log('Bot is not running', level='warning')
             return
         
         self.is_running = False
-        self.log('Bot stopping...', 'info')
+        self._mark_status_changed()
+        self.log('Bot stopping...', level='info')
         
         self.stop_event.set() # Signal all threads to stop
+        self._scheduler_q.put((float('-inf'), next(self._scheduler_seq), None)) # Stop sentinel, sorts first
+        self._scheduler_wakeup.set()
+        self._rest_exec.shutdown(wait=False)
+        self._lifecycle_wakeup.set()
+        self._entry_wakeup.set()
+        self._account_refresh_event.set()
         if self.ws:
             self.ws.close()
+        if self.private_ws:
+            self.private_ws.close()
         
         self.emit('bot_status', {'running': False})
     
+    def _schedule(self, delay, fn):
+        """Run fn on the okx-rest pool after delay seconds."""
+        self._scheduler_q.put((time.monotonic() + delay, next(self._scheduler_seq), fn))
+        self._scheduler_wakeup.set()
+
+    def _run_scheduler(self):
+        q = self._scheduler_q
+        while True:
+            # Cleared before picking, so anything queued after this point wakes the wait below
+            self._scheduler_wakeup.clear()
+            run_at, seq, fn = q.get()
+            if fn is None:
+                return
+            delay = run_at - time.monotonic()
+            if delay > 0 and self._scheduler_wakeup.wait(delay):
+                q.put((run_at, seq, fn)) # Something new arrived and may be due sooner; re-pick
+                continue
+            try:
+                self._rest_exec.submit(self._run_callback, fn)
+            except RuntimeError: # Executor already shut down by stop()
+                return
+
+    def _run_callback(self, fn):
+        try:
+            fn()
+        except Exception as e:
+            self.log(f"Exception in scheduled callback {getattr(fn, '__name__', fn)}: {e}", level="error")
+
+    def _expect_orders(self, order_ids):
+        """Register ack events for order_ids; call before issuing the request that acks them."""
+        for order_id in order_ids:
+            if order_id:
+                self._order_events.setdefault(order_id, threading.Event())
+
+    def _mark_order_done(self, order_id):
+        ev = self._order_events.get(order_id)
+        if ev is not None:
+            ev.set()
+
+    def _wait_for_order_ack(self, order_ids, timeout):
+        """Wait until every expected order is acked (cancel confirmed or terminal WS state), at most timeout seconds."""
+        deadline = time.monotonic() + timeout
+        acked = True
+        for order_id in order_ids:
+            ev = self._order_events.pop(order_id, None)
+            if ev is not None and not ev.wait(max(0.0, deadline - time.monotonic())):
+                acked = False
+        return acked
+
+    def _try_claim_entry_slot(self):
+        """Check 'flat and nothing pending' and reserve the entry slot in one critical section."""
+        with self.position_lock:
+            state = self._position_state
+            if state.in_position or state.pending_id:
+                return False
+            self._update_position_state(pending_id=_ENTRY_SLOT_CLAIMED)
+            return True
+
+    def _release_entry_slot(self):
+        # No-op once an order id has replaced the claim
+        with self.position_lock:
+            if self._position_state.pending_id == _ENTRY_SLOT_CLAIMED:
+                self._update_position_state(pending_id=None)
+
+    def _update_position_state(self, **changes):
+        # Call with position_lock held
+        self._position_state = replace(self._position_state, **changes)
+
+    @property
+    def account_balance(self):
+        return self._account_snapshot.total
+
+    @property
+    def available_balance(self):
+        return self._account_snapshot.available
+
+    @property
+    def in_position(self):
+        return self._position_state.in_position
+
+    @property
+    def position_entry_price(self):
+        return self._position_state.entry_price
+
+    @property
+    def position_qty(self):
+        return self._position_state.qty
+
+    @property
+    def current_take_profit(self):
+        return self._position_state.tp
+
+    @property
+    def current_stop_loss(self):
+        return self._position_state.sl
+
+    @property
+    def pending_entry_order_id(self):
+        return self._position_state.pending_id
+
+    @property
+    def entry_reduced_tp_flag(self):
+        return self._position_state.reduced_tp
+
+    @property
+    def _exit_ids(self):
+        return self._position_state.exit_orders
+
+    @property
+    def position_exit_orders(self):
+        sl_id, tp_id = self._position_state.exit_orders
+        orders = {}
+        if sl_id:
+            orders['sl'] = sl_id
+        if tp_id:
+            orders['tp'] = tp_id
+        return orders
+
+    def _mark_status_changed(self):
+        self.status_version += 1
+
+    def _status_snapshot(self):
+        with self.snapshot_lock:
+            open_trades = list(self.open_trades)
+        return {
+            'running': self.is_running,
+            'balance': self.current_balance,
+            'open_trades': open_trades,
+            'in_position': self.in_position,
+            'position_entry_price': self.position_entry_price,
+            'position_qty': self.position_qty,
+            'current_take_profit': self.current_take_profit,
+            'current_stop_loss': self.current_stop_loss
+        }
+
+    def get_status_json(self):
+        # Read the version before snapshotting so a concurrent change can only make the cache stale, never wrong
+        version = self.status_version
+        cached = self._status_json_cache
+        if cached is None or cached[0] != version:
+            cached = (version, orjson.dumps(self._status_snapshot()))
+            self._status_json_cache = cached
+        return cached[1]
+
+    def _sync_config_cache(self):
+        # Config is fixed for an engine's lifetime (updates require a stop), so hot paths read these
+        # bindings instead of hashing into self.config; call again if self.config is ever replaced
+        config = self.config
+        self._symbol = config['symbol']
+        self._cfg_tp_price_offset = config['tp_price_offset']
+        self._cfg_sl_price_offset = config['sl_price_offset']
+        self._cfg_entry_price_offset = config['entry_price_offset']
+        self._cfg_batch_offset = config['batch_offset']
+        self._cfg_max_allowed_used = config['max_allowed_used']
+        self._cfg_rate_divisor = config['rate_divisor']
+        self._cfg_target_order_amount = config['target_order_amount']
+        self._cfg_min_order_amount = config['min_order_amount']
+        self._cfg_long_safety_line_price = config['long_safety_line_price']
+        self._cfg_short_safety_line_price = config['short_safety_line_price']
+        self._cfg_loop_time_seconds = config['loop_time_seconds']
+        self._cfg_cancel_unfilled_seconds = config['cancel_unfilled_seconds']
+
     def _load_config(self):
         try:
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
+            with open(self.config_path, 'rb') as f:
+                config = orjson.loads(f.read())
                 # Ensure new config parameters have default values if not present
                 config.setdefault('max_allowed_used', 1000.0)
+                config.setdefault('target_order_amount', 100.0) # Read by _sync_config_cache at construction
                 config.setdefault('cancel_on_tp_price_below_market', True)
                 config.setdefault('cancel_on_entry_price_below_market', True)
                 config.setdefault('websocket_timeframes', ['1m', '5m']) # Add default for websocket_timeframes
                 return config
         except FileNotFoundError:
-            self.log(f"Config file not found: {self.config_path}", 'error')
+            self.log(f"Config file not found: {self.config_path}", level='error')
             raise
-        except json.JSONDecodeError as e:
-            self.log(f"Error decoding config file {self.config_path}: {e}", 'error')
+        except orjson.JSONDecodeError as e:
+            self.log(f"Error decoding config file {self.config_path}: {e}", level='error')
             raise
         except Exception as e:
-            self.log(f"An unexpected error occurred while loading config: {e}", 'error')
+            self.log(f"An unexpected error occurred while loading config: {e}", level='error')
             raise
 
     # ================================================================================
     # OKX API Helper Functions (Adapted as methods)
     # ================================================================================
 
+    def _get_okx_server_time_and_offset(self):
+        global server_time_offset
+        try:
+            response = self.session.get(f"{okx_rest_api_base_url}/api/v5/public/time", timeout=5)
+            response.raise_for_status()
+            json_response = orjson.loads(response.content)
+            if json_response.get('code') == '0' and json_response.get('data'):
+                server_timestamp_ms = int(json_response['data'][0]['ts'])
+                local_timestamp_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+                server_time_offset = server_timestamp_ms - local_timestamp_ms
+                self.log(f"OKX server time synchronized. Offset: {server_time_offset}ms", level="info")
+                return True
+            else:
+                self.log(f"Failed to get OKX server time: {json_response.get('msg', 'Unknown error')}", level="error")
+                return False
+        except requests.exceptions.RequestException as e:
+            self.log(f"Error fetching OKX server time: {e}", level="error")
+            return False
+        except Exception as e:
+            self.log(f"Unexpected error in get_okx_server_time_and_offset: {e}", level="error")
+            return False
+
     def _okx_request(self, method, path, params=None, body_dict=None, max_retries=3):
-        local_dt = datetime.now(timezone.utc)
-        adjusted_dt = local_dt + timedelta(milliseconds=server_time_offset)
-        timestamp = adjusted_dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        method_u = method.upper()
+        timestamp = okx_timestamp()
 
-        body_str = ''
-        if body_dict:
-            body_str = json.dumps(body_dict, separators=(',', ':'), sort_keys=True)
+        body_bytes = _json_dumps(body_dict) if body_dict else b''
+        body_str = body_bytes.decode('utf-8')
 
         request_path_for_signing = path
         final_url = f"{okx_rest_api_base_url}{path}" 
 
-        if params and method.upper() == 'GET':
-            query_string = '?' + '&'.join([f'{k}={v}' for k, v in sorted(params.items())])
+        if params and method_u == 'GET':
+            query_string = '?' + urlencode(sorted(params.items()), safe=',')
             request_path_for_signing += query_string
             final_url += query_string
 
-        signature = generate_okx_signature(timestamp, method, request_path_for_signing, body_str)
+        signature = generate_okx_signature(timestamp, method_u, request_path_for_signing, body_str)
 
-        headers = {
-            "OK-ACCESS-KEY": okx_api_key,
-            "OK-ACCESS-SIGN": signature,
-            "OK-ACCESS-TIMESTAMP": timestamp,
-            "OK-ACCESS-PASSPHRASE": okx_passphrase,
-            "Content-Type": "application/json"
-        }
-
-        headers.update(okx_simulated_trading_header)
+        headers = self._base_headers.copy()
+        headers["OK-ACCESS-SIGN"] = signature
+        headers["OK-ACCESS-TIMESTAMP"] = timestamp
 
         for attempt in range(max_retries):
             try:
-                req_func = getattr(requests, method.lower(), None)
-                if not req_func:
-                    self.log(f"Unsupported HTTP method: {method}", level="error")
-                    return None
-
                 kwargs = {'headers': headers, 'timeout': 15}
 
-                if body_dict and method.upper() in ['POST', 'PUT', 'DELETE']:
-                    kwargs['data'] = body_str
+                if body_dict and method_u in ('POST', 'PUT', 'DELETE'):
+                    kwargs['data'] = body_bytes
 
                 self.log(f"{method} {path} (Attempt {attempt + 1}/{max_retries})", level="info")
-                response = req_func(final_url, **kwargs)
-
-                if response.status_code != 200:
-                    try:
-                        error_json = response.json()
-                        self.log(f"API Error: Status={response.status_code}, Code={error_json.get('code')}, Msg={error_json.get('msg')}", level="error")
-                        okx_error_code = error_json.get('code')
-                        if okx_error_code:
-                            return error_json
-                    except json.JSONDecodeError:
-                        self.log(f"API Error: Status={response.status_code}, Response: {response.text[:200]}", level="error")
-
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                    return None
+                response = self.session.request(method_u, final_url, **kwargs)
 
+                # Decode once; both the success and the error paths read the same body
                 try:
-                    json_response = response.json()
+                    json_response = orjson.loads(response.content)
+                except orjson.JSONDecodeError:
+                    json_response = None
+
+                if response.status_code != 200:
+                    if json_response is not None:
+                        self.log(f"API Error: Status={response.status_code}, Code={json_response.get('code')}, Msg={json_response.get('msg')}", level="error")
+                        if json_response.get('code'):
+                            return json_response
+                    else:
+                        self.log(f"API Error: Status={response.status_code}, Response: {response.content[:200].decode('utf-8', errors='replace')}", level="error")
+                elif json_response is not None:
                     if json_response.get('code') != '0':
                         self.log(f"OKX API returned non-zero code: {json_response.get('code')} Msg: {json_response.get('msg')} for {method} {path}. Full Response: {json_response}", level="warning")
                     return json_response
-                except json.JSONDecodeError:
-                    self.log(f"Failed to decode JSON for {method} {path}. Status: {response.status_code}, Resp: {response.text[:200]}", level="error")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                    return None
+                else:
+                    self.log(f"Failed to decode JSON for {method} {path}. Status: {response.status_code}, Resp: {response.content[:200].decode('utf-8', errors='replace')}", level="error")
+
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+                    continue
+                return None
 
             except requests.exceptions.Timeout:
                 self.log(f"API request timeout (Attempt {attempt + 1}/{max_retries})", level="error")
@@ -566,7 +866,7 @@ class TradingBotEngine:
                 return None
             except requests.exceptions.RequestException as e:
                 status_code = e.response.status_code if e.response is not None else "N/A"
-                err_text = e.response.text[:200] if e.response is not None else 'No response text'
+                err_text = e.response.content[:200].decode('utf-8', errors='replace') if e.response is not None else 'No response text'
                 self.log(f"OKX API HTTP Error ({method} {path}): Status={status_code}, Error={e}. Response: {err_text}", level="error")
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)
@@ -584,76 +884,54 @@ class TradingBotEngine:
         try:
             path = "/api/v5/market/history-candles"
 
-            okx_timeframe_map = {
-                '1m': '1m', '3m': '3m', '5m': '5m', '15m': '15m', '30m': '30m',
-                '1h': '1H', '2h': '2H', '4h': '4H', '6h': '6H', '8h': '8H',
-                '12h': '12H', '1d': '1D', '1w': '1W', '1M': '1M'
-            }
-            okx_timeframe = okx_timeframe_map.get(timeframe)
+            okx_timeframe = _OKX_TF_MAP.get(timeframe)
 
             if not okx_timeframe:
                 self.log(f"Invalid timeframe for OKX: {timeframe}", level="error")
                 return []
 
-            all_data = []
             max_candles_limit = 100
+            # Every window asks for the max_candles_limit candles strictly older than its anchor,
+            # so the whole range can be laid out up front and fetched concurrently
+            step_ms = _INTERVALS_MS[timeframe] * max_candles_limit
+            anchors = list(range(end_ts_ms, start_ts_ms, -step_ms))
 
-            current_before_ms = end_ts_ms
+            self.log(f"Fetching historical data for {symbol} ({timeframe}) from {datetime.fromtimestamp(start_ts_ms/1000, tz=timezone.utc)} to {datetime.fromtimestamp(end_ts_ms/1000, tz=timezone.utc)} in {len(anchors)} windows", level="info")
 
-            self.log(f"Fetching historical data for {symbol} ({timeframe}) from {datetime.fromtimestamp(start_ts_ms/1000, tz=timezone.utc)} to {datetime.fromtimestamp(end_ts_ms/1000, tz=timezone.utc)}", level="info")
-
-            while True:
+            def fetch_window(anchor_ms):
                 params = {
                     "instId": symbol,
                     "bar": okx_timeframe,
                     "limit": str(max_candles_limit),
-                    "before": str(current_before_ms)
+                    "after": str(anchor_ms)
                 }
-
                 response = self._okx_request("GET", path, params=params)
-                
-                if response and response.get('code') == '0':
-                    rows = response.get('data', [])
-                    if rows:
-                        self.log(f"Fetched {len(rows)} candles for {timeframe}", level="info")
-                        parsed_klines = []
-                        for kline in rows:
-                            try:
-                                parsed_klines.append([
-                                    int(kline[0]),
-                                    float(kline[1]),
-                                    float(kline[2]),
-                                    float(kline[3]),
-                                    float(kline[4]),
-                                    float(kline[5])
-                                ])
-                            except (ValueError, TypeError, IndexError) as e:
-                                self.log(f"Error parsing OKX kline: {kline} - {e}", level="error")
-                                continue
-                        
-                        all_data.extend(parsed_klines)
-                        
-                        oldest_ts = int(rows[-1][0])
-                        current_before_ms = oldest_ts
-
-                        if oldest_ts <= start_ts_ms or len(rows) < max_candles_limit:
-                            break 
-                    else:
-                        break 
+                time.sleep(HISTORY_WINDOW_PACING_SECONDS)
+                return response
 
-                    time.sleep(0.3)
-                else:
+            with ThreadPoolExecutor(max_workers=HISTORY_FETCH_CONCURRENCY) as pool:
+                responses = list(pool.map(fetch_window, anchors))
+
+            # Every window holds at most max_candles_limit rows, so the buffer never needs to grow
+            buf = np.empty((len(anchors) * max_candles_limit, 6), dtype=np.float64)
+            filled = 0
+            for response in responses:
+                if not (response and response.get('code') == '0'):
                     self.log(f"Error fetching OKX klines: {response}", level="error")
                     return []
+
+                rows = response.get('data', [])
+                if not rows:
+                    continue
+                self.log(f"Fetched {len(rows)} candles for {timeframe}", level="info")
+                page = parse_kline_rows(rows, self.log)
+                buf[filled:filled + len(page)] = page
+                filled += len(page)
             
-            final_data = pd.DataFrame(all_data, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
-            if not final_data.empty:
-                final_data = final_data.drop_duplicates(subset=['Timestamp'])
-                final_data = final_data[final_data['Timestamp'] >= start_ts_ms]
-                final_data = final_data.sort_values(by='Timestamp', ascending=True)
-                return final_data.values.tolist()
-            else:
+            if not filled:
                 return []
+            # Stays an ndarray; _fetch_initial_historical_data wraps it in a DataFrame without copying
+            return finalize_klines(buf[:filled], start_ts_ms)
         except Exception as e:
             self.log(f"Exception in _fetch_historical_data_okx: {e}", level="error")
             return []
@@ -661,6 +939,21 @@ class TradingBotEngine:
     def _fetch_product_info(self, target_symbol):
         global PRODUCT_INFO
         try:
+            cached = _PRODUCT_CACHE.get(target_symbol)
+            if cached is not None and time.monotonic() - cached[0] < PRODUCT_CACHE_TTL_SECONDS:
+                PRODUCT_INFO = MappingProxyType({**PRODUCT_INFO, **cached[1]})
+                self.log(f"Product info for {target_symbol} reused from cache", level="info")
+                return True
+
+            disk_info = load_product_disk_cache(target_symbol)
+            if disk_info:
+                # Rebuilt rather than trusted: files written before the printf-style templates hold str.format ones
+                set_number_formats(disk_info)
+                _PRODUCT_CACHE[target_symbol] = (time.monotonic(), disk_info)
+                PRODUCT_INFO = MappingProxyType({**PRODUCT_INFO, **disk_info})
+                self.log(f"Product info for {target_symbol} loaded from disk cache", level="info")
+                return True
+
             path = "/api/v5/public/instruments"
             params = {"instType": "SWAP", "instId": target_symbol}
             response = self._okx_request("GET", path, params=params)
@@ -679,15 +972,25 @@ class TradingBotEngine:
                     self.log(f"Product {target_symbol} not found in OKX instruments response.", level="error")
                     return False
 
-                PRODUCT_INFO['priceTickSize'] = safe_float(product_data.get('tickSz'))
-                PRODUCT_INFO['qtyPrecision'] = int(np.abs(np.log10(safe_float(product_data.get('lotSz'))))) if safe_float(product_data.get('lotSz')) > 0 else 0
-                PRODUCT_INFO['pricePrecision'] = int(np.abs(np.log10(safe_float(product_data.get('tickSz'))))) if safe_float(product_data.get('tickSz')) > 0 else 0
-                PRODUCT_INFO['qtyStepSize'] = safe_float(product_data.get('lotSz'))
-                PRODUCT_INFO['minOrderQty'] = safe_float(product_data.get('minSz'))
+                tick_sz = product_data.get('tickSz')
+                lot_sz = product_data.get('lotSz')
+                info = dict(PRODUCT_INFO)
+                info['priceTickSize'] = safe_float(tick_sz)
+                info['qtyPrecision'] = step_precision(lot_sz)
+                info['pricePrecision'] = step_precision(tick_sz)
+                info['qtyStepSize'] = safe_float(lot_sz)
+                set_number_formats(info)
+                info['minOrderQty'] = safe_float(product_data.get('minSz'))
 
-                PRODUCT_INFO['contractSize'] = safe_float(product_data.get('ctVal', '1'), 1.0)
+                info['contractSize'] = safe_float(product_data.get('ctVal', '1'), 1.0)
 
-                self.log(f"Product info loaded for {target_symbol}: {PRODUCT_INFO}", level="info")
+                _PRODUCT_CACHE[target_symbol] = (time.monotonic(), info)
+                try:
+                    save_product_disk_cache(target_symbol, info)
+                except OSError as e:
+                    self.log(f"Could not write product info disk cache: {e} (continuing)", level="warning")
+                PRODUCT_INFO = MappingProxyType(info)
+                self.log(f"Product info loaded for {target_symbol}: {info}", level="info")
                 return True
             else:
                 self.log(f"Failed to fetch product info for {target_symbol} (code: {response.get('code') if response else 'N/A'}, msg: {response.get('msg') if response else 'N/A'})", level="error")
@@ -731,6 +1034,8 @@ class TradingBotEngine:
                     last_price = ticker_info.get('last')
                     if last_price is not None:
                         current_price = safe_float(last_price)
+                        if symbol == self._symbol:
+                            self._last_price = (time.monotonic(), current_price)
                         self.log(f"Current market price (REST): ${current_price:.2f}", level="info")
                         return current_price
                     else:
@@ -744,6 +1049,14 @@ class TradingBotEngine:
             self.log(f"Exception in get_current_market_price: {e}", level="error")
             return None
 
+    def _get_current_market_price_cached(self, symbol, max_age=0.25):
+        """Last price for symbol if seen within max_age seconds (WS tick or REST), else a REST fetch."""
+        if symbol == self._symbol:
+            seen_at, px = self._last_price
+            if px and time.monotonic() - seen_at < max_age:
+                return px
+        return self._get_current_market_price(symbol)
+
     # ================================================================================
     # OKX WebSocket Implementation
     # ================================================================================
@@ -753,45 +1066,174 @@ class TradingBotEngine:
         return "wss://ws.okx.com:8443/ws/v5/public"
 
     def _on_websocket_message(self, ws_app, message):
-        self.log(f"DEBUG: _on_websocket_message received raw message: {message[:500]}", level="debug") # Log all incoming messages
-        try:
-            msg = json.loads(message)
-            self.log(f"DEBUG: _on_websocket_message received parsed message: {msg}", level="debug")
+        # Heartbeat replies and re-sent subscribe acks carry nothing we act on; skip them before decoding
+        if message == 'pong':
+            return
+        if message.startswith('{"event":"subscribe"') and self.ws_subscriptions_ready.is_set():
+            return
 
-            # Handle event messages (subscribe)
-            if 'event' in msg:
+        debug_enabled = self._debug_enabled
+        if debug_enabled:
+            self.log("DEBUG: _on_websocket_message received raw message: %s", message[:500], level="debug") # Log all incoming messages
+        try:
+            msg = orjson.loads(message)
+            if debug_enabled:
+                self.log("DEBUG: _on_websocket_message received parsed message: %s", msg, level="debug")
+
+            # Market data is nearly every frame, so check for it before subscription events
+            data = msg.get('data')
+            if data:
+                handler = self._ws_handlers.get(msg.get('arg', {}).get('channel'))
+                if handler is not None:
+                    handler(data)
+            elif 'event' in msg:
                 if msg['event'] == 'subscribe':
                     arg = msg.get('arg', {})
                     channel_id = f"{arg.get('channel')}:{arg.get('instId')}"
                     self.log(f"Subscription confirmed for {channel_id}: {msg}", level="info")
                     self.confirmed_subscriptions.add(channel_id)
-                    if self.pending_subscriptions == self.confirmed_subscriptions:
+                    self._pending_ack_count -= 1
+                    if self._pending_ack_count == 0:
                         self.log("All expected WebSocket subscriptions are ready.", level="info")
                         self.ws_subscriptions_ready.set()
                 else: # Log other event messages
                     self.log(f"Received non-subscribe event message: {msg}", level="warning")
-                # Do NOT return here, allow further processing if it's a data message that also has an event.
-            
-            if 'data' in msg:
-                channel = msg.get('arg', {}).get('channel', '')
-                data = msg.get('data', [])
-
-                if channel == 'trades' and data:
-                    with self.trade_data_lock:
-                        self.latest_trade_timestamp = int(data[-1].get('ts'))
-                        self.latest_trade_price = safe_float(data[-1].get('px'))
-
-                elif channel == 'tickers' and data:
-                    # Process ticker data to update latest_trade_price
-                    # The `last` field from ticker data represents the current price
-                    self.latest_trade_price = safe_float(data[0].get('last'))
-                    # No need to update historical data store from tickers channel
-
-        except json.JSONDecodeError:
-            self.log(f"DEBUG: Non-JSON WebSocket message received: {message[:500]}", level="debug")
+
+        except orjson.JSONDecodeError:
+            if debug_enabled:
+                self.log("DEBUG: Non-JSON WebSocket message received: %s", message[:500], level="debug")
         except Exception as e:
             self.log(f"Exception in on_websocket_message: {e}", level="error")
 
+    def _handle_trades_msg(self, data):
+        trade = data[-1]
+        px = safe_float(trade.get('px'))
+        self.latest_trade = (int(trade.get('ts')), px)
+        self._last_price = (time.monotonic(), px)
+
+    def _handle_tickers_msg(self, data):
+        # The `last` field from ticker data represents the current price
+        ticker = data[0]
+        ts = ticker.get('ts')
+        px = safe_float(ticker.get('last'))
+        self.latest_trade = (int(ts) if ts is not None else self.latest_trade[0], px)
+        self._last_price = (time.monotonic(), px)
+
+    def _handle_positions_msg(self, data):
+        positions_by_inst = group_by_inst(data)
+        now = time.monotonic()
+        for inst_id, rows in positions_by_inst.items():
+            # The engine only opens longs (its OCO exit is sent with posSide long)
+            self._ws_position_snapshot[inst_id] = (now, pick_position_row(rows))
+            self._positions_cache[('SWAP', inst_id)] = (now, {'code': '0', 'data': rows})
+        self._detect_sl_from_position_update(positions_by_inst)
+
+    def _handle_account_msg(self, data):
+        self._apply_account_details(data[0])
+        self._account_pushed_at = time.monotonic()
+        self._emit_account_update()
+
+    def _apply_account_details(self, account_details):
+        self._account_snapshot = AccountSnapshot(
+            total=safe_float(account_details.get('totalEq', '0')),
+            available=safe_float(account_details.get('availEq', '0')),
+            ts=time.monotonic())
+
+    # ================================================================================
+    # OKX Private WebSocket (account, positions, orders, orders-algo)
+    # ================================================================================
+
+    def _get_private_ws_url(self):
+        if self.config['use_testnet']:
+            return "wss://wspap.okx.com:8443/ws/v5/private"
+        return "wss://ws.okx.com:8443/ws/v5/private"
+
+    def _start_private_websocket(self):
+        try:
+            self.private_ws = websocket.WebSocketApp(
+                self._get_private_ws_url(),
+                on_open=self._on_private_ws_open,
+                on_message=self._on_private_ws_message,
+                on_error=self._on_websocket_error,
+                on_close=self._on_private_ws_close
+            )
+        except Exception as e:
+            self.log(f"Exception initializing private WebSocket: {e}", level="error")
+            return
+        threading.Thread(target=self.private_ws.run_forever, name="OKXPrivateWS", daemon=True).start()
+
+    def _on_private_ws_open(self, ws_app):
+        self._private_ws_last_msg = time.monotonic()
+        ts = str(int(time.time() + server_time_offset / 1000))
+        login = {"op": "login", "args": [{
+            "apiKey": okx_api_key,
+            "passphrase": okx_passphrase,
+            "timestamp": ts,
+            "sign": generate_okx_signature(ts, "GET", "/users/self/verify"),
+        }]}
+        ws_app.send(_dumps(login))
+        self.log("OKX private WebSocket opened; logging in...", level="info")
+
+    def _on_private_ws_message(self, ws_app, message):
+        self._private_ws_last_msg = time.monotonic()
+        if message == 'pong':
+            return
+        try:
+            msg = orjson.loads(message)
+            data = msg.get('data')
+            if data:
+                handler = self._ws_handlers.get(msg.get('arg', {}).get('channel'))
+                if handler is not None:
+                    handler(data)
+                return
+            event = msg.get('event')
+            if event == 'login':
+                if msg.get('code') == '0':
+                    self._subscribe_private_channels(ws_app)
+                else:
+                    self.log(f"Private WebSocket login failed: {msg.get('msg')}", level="error")
+            elif event == 'subscribe':
+                arg = msg.get('arg', {})
+                self.log(f"Private subscription confirmed for {arg.get('channel')}", level="info")
+            elif event == 'error':
+                self.log(f"Private WebSocket error event: {msg}", level="error")
+        except orjson.JSONDecodeError:
+            pass
+        except Exception as e:
+            self.log(f"Exception in on_private_ws_message: {e}", level="error")
+
+    def _subscribe_private_channels(self, ws_app):
+        symbol = self._symbol
+        channels = [
+            {"channel": "account", "ccy": "USDT"},
+            {"channel": "positions", "instType": "SWAP", "instId": symbol},
+            {"channel": "orders", "instType": "SWAP", "instId": symbol},
+            {"channel": "orders-algo", "instType": "SWAP", "instId": symbol},
+        ]
+        ws_app.send(_dumps({"op": "subscribe", "args": channels}))
+        self.log(f"WS Sent private subscription request for {len(channels)} channels.", level="info")
+
+    def _on_private_ws_close(self, ws_app, close_status_code, close_msg):
+        self.log("OKX private WebSocket closed.", level="warning")
+        if self.is_running and not self.stop_event.is_set():
+            self._schedule(5.0, self._start_private_websocket)
+
+    def _private_ws_watchdog(self):
+        # OKX expects a 'ping' on a quiet connection; if even that goes unanswered, reconnect
+        while not self.stop_event.wait(PRIVATE_WS_PING_SECONDS / 2):
+            ws_app = self.private_ws
+            if ws_app is None:
+                continue
+            silent_for = time.monotonic() - self._private_ws_last_msg
+            try:
+                if silent_for > PRIVATE_WS_STALE_SECONDS:
+                    self.log("Private WebSocket silent too long; reconnecting.", level="warning")
+                    ws_app.close() # on_close schedules the reconnect
+                elif silent_for > PRIVATE_WS_PING_SECONDS:
+                    ws_app.send('ping')
+            except Exception as e:
+                self.log(f"Private WebSocket watchdog error: {e}", level="warning")
+
     def _on_websocket_open(self, ws_app):
         self.log("OKX WebSocket connection opened.", level="info")
         # For public endpoints, authentication is not required, directly send subscriptions
@@ -800,21 +1242,38 @@ class TradingBotEngine:
 
     def _send_websocket_subscriptions(self):
         channels = [
-            {"channel": "trades", "instId": self.config['symbol']},
-            {"channel": "tickers", "instId": self.config['symbol']}, # Public tickers channel for real-time price
+            {"channel": "trades", "instId": self._symbol},
+            {"channel": "tickers", "instId": self._symbol}, # Public tickers channel for real-time price
         ]
         
         # Temporarily removed candle subscriptions until correct format for ETH-USDT-SWAP is confirmed
  
-        subscription_payload = {
-            "op": "subscribe",
-            "args": channels
-        }
-        self.log(f"WS Sending public subscription request: {json.dumps(subscription_payload)}", level="info")
-        self.ws.send(json.dumps(subscription_payload))
-        self.log(f"WS Sent public subscription request for {len(channels)} channels.", level="info")
-        # Populate pending_subscriptions with the channels we just sent
+        # Populate pending_subscriptions before sending so a fast ack can't race ahead of it
         self.pending_subscriptions = {f"{arg['channel']}:{arg['instId']}" for arg in channels}
+        self._pending_ack_count = len(channels)
+        self._queue_ws_op("subscribe", channels)
+        self._flush_ws_sends()
+        self.log(f"WS Sent public subscription request for {len(channels)} channels.", level="info")
+
+    def _queue_ws_op(self, op, args):
+        with self._ws_send_lock:
+            self._ws_send_queue.append((op, args))
+
+    def _flush_ws_sends(self):
+        """Send everything queued, merging consecutive ops of the same kind into one frame."""
+        with self._ws_send_lock:
+            frames = []
+            while self._ws_send_queue:
+                op, args = self._ws_send_queue.popleft()
+                if frames and frames[-1]["op"] == op:
+                    frames[-1]["args"].extend(args)
+                else:
+                    frames.append({"op": op, "args": list(args)})
+
+            for frame in frames:
+                payload = _dumps(frame)
+                self.log(f"WS Sending {frame['op']} request: {payload}", level="info")
+                self.ws.send(payload)
 
     def _on_websocket_error(self, ws_app, error):
         self.log(f"OKX WebSocket error: {error}", level="error")
@@ -849,64 +1308,39 @@ class TradingBotEngine:
             return
 
         with self.data_lock:
-            df = self.historical_data_store.get(timeframe_key)
-            if df is None:
+            ring = self.historical_data_store.get(timeframe_key)
+            if ring is None:
                 return
 
-            new_data_points = []
-            for kline in klines_ws:
-                try:
-                    ts_ms = int(kline[0])
-                    o = float(kline[1])
-                    h = float(kline[2])
-                    l = float(kline[3])
-                    c = float(kline[4])
-                    v = float(kline[5])
-
-                    if not (l <= h):
-                        continue
-
-                    dt_utc = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
-
-                    if not df.empty and dt_utc == df.index[-1]:
-                        df.at[dt_utc, 'Open'] = o
-                        df.at[dt_utc, 'High'] = h
-                        df.at[dt_utc, 'Low'] = l
-                        df.at[dt_utc, 'Close'] = c
-                        df.at[dt_utc, 'Volume'] = v
-                        continue
-
-                    new_data_points.append({
-                        'Datetime': dt_utc,
-                        'Open': o,
-                        'High': h,
-                        'Low': l,
-                        'Close': c,
-                        'Volume': v
-                    })
-
-                except (ValueError, TypeError, IndexError):
-                    continue
-
-            if not new_data_points:
-                return
-
-            temp_df = pd.DataFrame(new_data_points).set_index('Datetime')
-            original_last_time = df.index[-1] if not df.empty else None
-
-            combined_df = pd.concat([df, temp_df])
-            combined_df = combined_df[~combined_df.index.duplicated(keep='last')]
-            combined_df = combined_df.sort_index()
-
-            if len(combined_df) > 1000:
-                combined_df = combined_df.iloc[-1000:]
-
-            self.historical_data_store[timeframe_key] = combined_df
-
-            if original_last_time is not None and not combined_df.empty:
-                current_last_time = combined_df.index[-1]
-                if current_last_time > original_last_time:
-                    self.log(f"New {timeframe_key} candle: {current_last_time}", level="info")
+            # One bulk cast for the batch, then drop rows whose low is above their high
+            rows = parse_kline_rows(klines_ws, self.log)
+            rows = rows[rows[:, 3] <= rows[:, 2]]
+            # Keep the last push per timestamp; np.unique also leaves the batch in ascending order
+            # (OKX may push newest-first)
+            rows = rows[::-1]
+            _, last_push = np.unique(rows[:, 0], return_index=True)
+            rows = rows[last_push]
+
+            # Timestamps stay integer ms throughout; no per-row datetime objects
+            original_last_ts = ring.last_ts()
+            if original_last_ts is not None and len(rows):
+                forming = rows[rows[:, 0] == original_last_ts]
+                if len(forming):
+                    ring.update_last(forming[-1, 1:6]) # Still-forming candle
+                # Anything older than the newest stored candle is a late duplicate; drop it
+                rows = rows[rows[:, 0] > original_last_ts]
+            if len(rows):
+                ring.extend(rows)
+
+            current_last_ts = ring.last_ts()
+            if original_last_ts is not None and current_last_ts > original_last_ts:
+                self.log(f"New {timeframe_key} candle: {datetime.fromtimestamp(current_last_ts / 1000, tz=timezone.utc)}", level="info")
+
+    def get_history_frame(self, timeframe_key):
+        """Oldest-first DataFrame of the stored candles for a timeframe, or None if none are loaded."""
+        with self.data_lock:
+            ring = self.historical_data_store.get(timeframe_key)
+            return ring.to_frame() if ring is not None else None
 
     def _fetch_initial_historical_data(self, symbol, timeframe, start_date_str, end_date_str):
         with self.data_lock:
@@ -918,30 +1352,29 @@ class TradingBotEngine:
 
                 raw_data = self._fetch_historical_data_okx(symbol, timeframe, start_ts_ms, end_ts_ms)
 
-                if raw_data:
-                    df = pd.DataFrame(raw_data, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
-                    df.dropna(subset=['Open', 'High', 'Low', 'Close', 'Volume'], inplace=True)
+                if len(raw_data):
+                    data = raw_data[~np.isnan(raw_data[:, 1:]).any(axis=1)]
 
-                    if df.empty:
+                    if not len(data):
                         self.log(f"No valid data for {timeframe}", level="error")
                         return False
 
-                    invalid_rows = df[(df['Low'] > df['High']) |
-                                    (df['Open'] < df['Low']) | (df['Open'] > df['High']) |
-                                    (df['Close'] < df['Low']) | (df['Close'] > df['High'])]
-
-                    if not invalid_rows.empty:
-                        self.log(f"WARNING: Found {len(invalid_rows)} invalid OHLC rows", level="warning")
-                        df = df[(df['Low'] <= df['High'])]
+                    # One pass over the columns; only an inverted high/low makes a row unusable
+                    o, h, l, c = data[:, 1], data[:, 2], data[:, 3], data[:, 4]
+                    range_ok = l <= h
+                    valid = range_ok & (o >= l) & (o <= h) & (c >= l) & (c <= h)
+                    invalid_count = len(valid) - int(np.count_nonzero(valid))
 
-                    df['Datetime'] = pd.to_datetime(df['Timestamp'], unit='ms', utc=True)
-                    df = df.set_index('Datetime')
-                    df = df[~df.index.duplicated(keep='first')]
-                    df = df.sort_index()
+                    if invalid_count:
+                        self.log(f"WARNING: Found {invalid_count} invalid OHLC rows", level="warning")
+                        data = data[range_ok]
 
-                    self.historical_data_store[timeframe] = df
+                    # Rows arrive deduplicated and ascending from _fetch_historical_data_okx
+                    ring = CandleRing()
+                    ring.extend(data)
+                    self.historical_data_store[timeframe] = ring
 
-                    self.log(f"Loaded {len(df)} candles for {timeframe}", level="info")
+                    self.log(f"Loaded {ring.size} candles for {timeframe}", level="info")
                     return True
                 else:
                     self.log(f"Failed to fetch data for {timeframe}", level="error")
@@ -950,38 +1383,78 @@ class TradingBotEngine:
                 self.log(f"Exception in _fetch_initial_historical_data: {e}", level="error")
                 return False
 
-    def _okx_place_order(self, symbol, side, qty, price=None, order_type="Market",
-                        time_in_force=None, reduce_only=False,
-                        stop_loss_price=None, take_profit_price=None):
-        try:
-            path = "/api/v5/trade/order"
-            price_precision = PRODUCT_INFO.get('pricePrecision', 4)
-            qty_precision = PRODUCT_INFO.get('qtyPrecision', 8)
-
-            order_qty_str = f"{qty:.{qty_precision}f}"
+    def _cached_positions(self, inst_type, inst_id, ttl=2.5):
+        """GET /account/positions for (inst_type, inst_id), reusing a response (or push) younger than ttl seconds."""
+        key = (inst_type, inst_id)
+        now = time.monotonic()
+        hit = self._positions_cache.get(key)
+        if hit and now - hit[0] < ttl:
+            return hit[1]
+        response = self._okx_request("GET", "/api/v5/account/positions", params={"instType": inst_type, "instId": inst_id})
+        if response and response.get('code') == '0':
+            self._positions_cache[key] = (now, response)
+        return response
 
-            body = {
-                "instId": symbol,
-                "tdMode": "cross",
-                "side": side.lower(),
-                "ordType": order_type.lower(),
-                "sz": order_qty_str,
-            }
+    def _build_order_body(self, symbol, side, qty, price=None, order_type="Market",
+                          time_in_force=None, reduce_only=False):
+        body = {
+            "instId": symbol,
+            "tdMode": "cross",
+            "side": side.lower(),
+            "ordType": order_type.lower(),
+            "sz": PRODUCT_INFO['qtyFmt'] % qty,
+        }
 
-            if order_type.lower() == "limit" and price is not None:
-                body["px"] = f"{price:.{price_precision}f}"
+        if order_type.lower() == "limit" and price is not None:
+            body["px"] = PRODUCT_INFO['priceFmt'] % price
 
-            if time_in_force:
-                if time_in_force == "GoodTillCancel":
-                    body["timeInForce"] = "GTC"
+        if time_in_force:
+            if time_in_force == "GoodTillCancel":
+                body["timeInForce"] = "GTC"
+            else:
+                body["timeInForce"] = time_in_force
+
+        if reduce_only:
+            body["reduceOnly"] = True
+        return body
+
+    def _okx_place_batch_orders(self, bodies):
+        """Place orders OKX_BATCH_LIMIT per batch-orders request; returns one result per body
+        (the OKX data item when sCode is '0', else None), in the order given."""
+        path = "/api/v5/trade/batch-orders"
+        results = []
+        for i in range(0, len(bodies), OKX_BATCH_LIMIT):
+            chunk = bodies[i:i + OKX_BATCH_LIMIT]
+            self.log(f"Placing {len(chunk)} OKX orders in one batch...", level="info")
+            self._positions_cache.clear() # The fills may change positions
+            response = self._okx_request("POST", path, body_dict=chunk)
+            self._account_refresh_event.set()
+            # A partial failure comes back with a non-zero top-level code but still one data item per order
+            data = response.get('data') if response else None
+            if not data or len(data) != len(chunk):
+                error_msg = response.get('msg', 'Unknown error') if response else 'No response'
+                self.log(f"✗ Batch order placement failed: {error_msg}. Response: {response}", level="error")
+                results.extend([None] * len(chunk))
+                continue
+            for item in data:
+                if item.get('sCode') == '0' and item.get('ordId'):
+                    results.append(item)
                 else:
-                    body["timeInForce"] = time_in_force
+                    self.log(f"✗ Order in batch rejected: {item.get('sMsg')}", level="error")
+                    results.append(None)
+        return results
 
-            if reduce_only:
-                body["reduceOnly"] = True
+    def _okx_place_order(self, symbol, side, qty, price=None, order_type="Market",
+                        time_in_force=None, reduce_only=False,
+                        stop_loss_price=None, take_profit_price=None):
+        try:
+            path = "/api/v5/trade/order"
+            body = self._build_order_body(symbol, side, qty, price, order_type, time_in_force, reduce_only)
 
-            self.log(f"Placing {order_type} {side} order for {order_qty_str} {symbol} at {price}", level="info")
+            self.log(f"Placing {order_type} {side} order for {body['sz']} {symbol} at {price}", level="info")
+            self._positions_cache.clear() # The fill may change positions
             response = self._okx_request("POST", path, body_dict=body)
+            self._account_refresh_event.set()
 
             if response and response.get('code') == '0':
                 order_data = response.get('data', [])
@@ -1031,9 +1504,11 @@ class TradingBotEngine:
             response = self._okx_request("POST", path, body_dict=body)
 
             if response and response.get('code') == '0':
+                self._mark_order_done(order_id)
                 self.log(f"✓ Order cancelled", level="info")
                 return True
             elif response and response.get('code') == '51001':
+                self._mark_order_done(order_id)
                 self.log(f"Order already filled/cancelled (OK)", level="info")
                 return True
             else:
@@ -1055,9 +1530,11 @@ class TradingBotEngine:
             response = self._okx_request("POST", path, body_dict=body)
 
             if response and response.get('code') == '0':
+                self._mark_order_done(algo_id)
                 self.log(f"✓ Algo order cancelled", level="info")
                 return True
             elif response and response.get('code') == '51001':
+                self._mark_order_done(algo_id)
                 self.log(f"Algo order already filled/cancelled (OK)", level="info")
                 return True
             else:
@@ -1067,12 +1544,65 @@ class TradingBotEngine:
             self.log(f"Exception in _okx_cancel_algo_order: {e}", level="error")
             return False
 
+    def _okx_cancel_batch_orders(self, symbol, order_ids):
+        """Cancel orders OKX_BATCH_LIMIT per request; returns how many OKX confirmed cancelled."""
+        path = "/api/v5/trade/cancel-batch-orders"
+        cancelled = 0
+        for i in range(0, len(order_ids), OKX_BATCH_LIMIT):
+            chunk = order_ids[i:i + OKX_BATCH_LIMIT]
+            body = [{"instId": symbol, "ordId": order_id} for order_id in chunk]
+            self.log(f"Cancelling {len(chunk)} OKX orders in one batch...", level="info")
+            response = self._okx_request("POST", path, body_dict=body)
+            if not response:
+                self.log("Batch cancel got no response (OK, continuing)", level="warning")
+                continue
+            for result in response.get('data', []):
+                if result.get('sCode') == '0':
+                    cancelled += 1
+                    self._mark_order_done(result.get('ordId'))
+                else:
+                    self.log(f"Order {str(result.get('ordId'))[:12]}... not cancelled (OK, continuing): {result.get('sMsg')}", level="warning")
+        return cancelled
+
+    def _okx_cancel_algo_orders_batch(self, symbol, algo_ids):
+        """Cancel algo orders OKX_ALGO_BATCH_LIMIT per request; returns how many OKX confirmed cancelled."""
+        path = "/api/v5/trade/cancel-algos"
+        cancelled = 0
+        for i in range(0, len(algo_ids), OKX_ALGO_BATCH_LIMIT):
+            chunk = algo_ids[i:i + OKX_ALGO_BATCH_LIMIT]
+            body = [{"instId": symbol, "algoId": algo_id} for algo_id in chunk]
+            self.log(f"Cancelling {len(chunk)} OKX algo orders in one batch...", level="info")
+            response = self._okx_request("POST", path, body_dict=body)
+            if not response:
+                self.log("Batch algo cancel got no response (OK, continuing)", level="warning")
+                continue
+            for result in response.get('data', []):
+                if result.get('sCode') == '0':
+                    cancelled += 1
+                    self._mark_order_done(result.get('algoId'))
+                else:
+                    self.log(f"Algo order {str(result.get('algoId'))[:12]}... not cancelled (OK, continuing): {result.get('sMsg')}", level="warning")
+        return cancelled
+
+    def _pending_algo_ids_by_side(self, symbol):
+        """posSide -> set of algoIds of the live TP/SL (conditional/OCO) algo orders for symbol."""
+        params = {"instType": "SWAP", "instId": symbol, "ordType": "conditional,oco"}
+        response = self._okx_request("GET", "/api/v5/trade/orders-algo-pending", params=params)
+        by_side = {}
+        if not response or response.get('code') != '0':
+            self.log(f"Could not list pending algo orders for {symbol} (falling back to tracked ids): {response}", level="warning")
+            return by_side
+        for algo in response.get('data', []):
+            if algo.get('algoId'):
+                by_side.setdefault(algo.get('posSide'), set()).add(algo['algoId'])
+        return by_side
+
     def _close_all_entry_orders(self):
         try:
             self.log("Attempting to close unfilled linear entry orders...", level="info")
 
             path = "/api/v5/trade/orders-pending"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
+            params = {"instType": "SWAP", "instId": self._symbol}
             response = self._okx_request("GET", path, params=params)
 
             if not response or response.get('code') != '0':
@@ -1080,19 +1610,15 @@ class TradingBotEngine:
                 return True
 
             orders = response.get('data', [])
+            entry_order_ids = [
+                order.get('ordId') for order in orders
+                if order.get('ordId') and order.get('side') == 'buy' and order.get('state') not in ['filled', 'canceled', 'rejected']
+            ]
             cancelled_count = 0
-
-            for order in orders:
-                try:
-                    order_id = order.get('ordId')
-                    status = order.get('state')
-                    side = order.get('side')
-                    if side == 'buy' and status not in ['filled', 'canceled', 'rejected']:
-                        if self._okx_cancel_order(self.config['symbol'], order_id):
-                            cancelled_count += 1
-                            time.sleep(0.1)
-                except Exception as e:
-                    self.log(f"Error processing OKX order: {e}", level="error")
+            if entry_order_ids:
+                self._expect_orders(entry_order_ids)
+                cancelled_count = self._okx_cancel_batch_orders(self._symbol, entry_order_ids)
+                self._wait_for_order_ack(entry_order_ids, timeout=0.5)
 
             if cancelled_count > 0:
                 self.log(f"✓ Closed {cancelled_count} unfilled linear entry orders", level="info")
@@ -1109,18 +1635,16 @@ class TradingBotEngine:
             self.tp_hit_triggered = True # Set the flag immediately
 
         try:
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("🎯 TP HIT (0.7%) - EXECUTING PROTOCOL", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             self.log("Step 1: Closing unfilled entry orders...", level="info")
             self._close_all_entry_orders()
 
-            time.sleep(1)
-
             self.log("Step 2: Checking OKX position status...", level="info")
             path = "/api/v5/account/positions"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
+            params = {"instType": "SWAP", "instId": self._symbol}
             response = self._okx_request("GET", path, params=params)
 
             position_still_open = False
@@ -1129,24 +1653,27 @@ class TradingBotEngine:
             if response and response.get('code') == '0':
                 positions = response.get('data', [])
                 for pos in positions:
-                    if pos.get('instId') == self.config['symbol']:
-                        pos_qty_str = pos.get('pos', '0')
-                        size_val = safe_float(pos_qty_str)
-                        if size_val > 0:
-                            position_still_open = True
-                            open_qty = size_val
-                            self.log(f"OKX position still open: {open_qty} {self.config['symbol']} (partial fill)", level="info")
-                            break
+                    pos_qty_str = pos.get('pos', '0')
+                    size_val = safe_float(pos_qty_str)
+                    if size_val > 0:
+                        position_still_open = True
+                        open_qty = size_val
+                        self.log(f"OKX position still open: {open_qty} {self._symbol} (partial fill)", level="info")
+                        break
 
             if position_still_open and open_qty > 0:
                 self.log("Step 3: Waiting 3 seconds (monitoring 3 x 1-second candles)...", level="info")
-                for i in range(3):
-                    self.log(f"  [{i+1}/3 seconds elapsed]", level="info")
-                    time.sleep(1)
+                # Returns early if the bot is stopped mid-wait
+                if self.stop_event.wait(3.0):
+                    self.log("Bot stopping - skipping TP market close", level="warning")
+                    with self.tp_hit_lock:
+                        self.tp_hit_triggered = False
+                    return
+                self.log("  3 seconds elapsed", level="info")
 
                 self.log("Step 4: Market closing remaining OKX position...", level="info")
                 exit_order_response = self._okx_place_order(
-                    self.config['symbol'],
+                    self._symbol,
                     "Sell",
                     open_qty,
                     order_type="Market",
@@ -1154,7 +1681,7 @@ class TradingBotEngine:
                 )
 
                 if exit_order_response and exit_order_response.get('ordId'):
-                    self.log(f"✓ Market close order placed for {open_qty} {self.config['symbol']}", level="info")
+                    self.log(f"✓ Market close order placed for {open_qty} {self._symbol}", level="info")
                 else:
                     self.log(f"⚠ Market close order may have failed (OK if already closed)", level="warning")
 
@@ -1167,9 +1694,9 @@ class TradingBotEngine:
             with self.tp_hit_lock:
                 self.tp_hit_triggered = False
 
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("✓ TP HIT PROTOCOL COMPLETE (OKX)", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
         except Exception as e:
             self.log(f"Exception in _handle_tp_hit (OKX): {e} (continuing)", level="error")
@@ -1178,42 +1705,41 @@ class TradingBotEngine:
 
     def _handle_eod_exit(self):
         try:
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("🕐 EOD EXIT TRIGGERED (OKX)", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
-            with self.position_lock:
-                is_in_pos = self.in_position
-                pos_qty = self.position_qty
+            state = self._position_state
+            is_in_pos = state.in_position
+            pos_qty = state.qty
 
             self.log("Step 1: Checking for open OKX positions...", level="info")
 
             try:
                 path = "/api/v5/account/positions"
-                params = {"instType": "SWAP", "instId": self.config['symbol']}
+                params = {"instType": "SWAP", "instId": self._symbol}
                 response = self._okx_request("GET", path, params=params)
 
                 if response and response.get('code') == '0':
                     positions = response.get('data', [])
                     for pos in positions:
-                        if pos.get('instId') == self.config['symbol']:
-                            pos_qty_str = pos.get('pos', '0')
-                            size_val = safe_float(pos_qty_str)
-                            if size_val > 0:
-                                self.log(f"Found open long OKX position: {size_val} {self.config['symbol']} - closing...", level="info")
-                                exit_order_response = self._okx_place_order(
-                                    self.config['symbol'],
-                                    "Sell",
-                                    size_val,
-                                    order_type="Market",
-                                    reduce_only=True
-                                )
-                                if exit_order_response and exit_order_response.get('ordId'):
-                                    self.log(f"✓ Market close order placed", level="info")
-                                else:
-                                    self.log(f"⚠ Market close failed (OK if already closed)", level="warning")
-                                time.sleep(1)
-                                break
+                        pos_qty_str = pos.get('pos', '0')
+                        size_val = safe_float(pos_qty_str)
+                        if size_val > 0:
+                            self.log(f"Found open long OKX position: {size_val} {self._symbol} - closing...", level="info")
+                            exit_order_response = self._okx_place_order(
+                                self._symbol,
+                                "Sell",
+                                size_val,
+                                order_type="Market",
+                                reduce_only=True
+                            )
+                            if exit_order_response and exit_order_response.get('ordId'):
+                                self.log(f"✓ Market close order placed", level="info")
+                            else:
+                                self.log(f"⚠ Market close failed (OK if already closed)", level="warning")
+                            time.sleep(1)
+                            break
                 else:
                     self.log("No OKX positions found or API error (OK)", level="info")
             except Exception as e:
@@ -1225,23 +1751,26 @@ class TradingBotEngine:
             except Exception as e:
                 self.log(f"Error closing entry orders: {e} (OK, continuing)", level="warning")
 
-            time.sleep(0.5)
-
             self.log("Step 3: Force cancelling all remaining OKX orders...", level="info")
             try:
-                path = "/api/v5/trade/cancel-all-after"
-                body = {"timeOut": "0", "instType": "SWAP"}
-                response = self._okx_request("POST", path, body_dict=body)
+                path = "/api/v5/trade/orders-pending"
+                params = {"instType": "SWAP", "instId": self._symbol}
+                response = self._okx_request("GET", path, params=params)
                 if response and response.get('code') == '0':
-                    self.log(f"✓ All OKX orders cancelled", level="info")
+                    remaining_ids = [order.get('ordId') for order in response.get('data', []) if order.get('ordId')]
+                    if remaining_ids:
+                        cancelled = self._okx_cancel_batch_orders(self._symbol, remaining_ids)
+                        self.log(f"✓ Cancelled {cancelled}/{len(remaining_ids)} remaining OKX orders", level="info")
+                    else:
+                        self.log(f"✓ No remaining OKX orders", level="info")
                 else:
-                    self.log(f"⚠ All OKX orders cancel response: {response} (OK)", level="warning")
+                    self.log(f"⚠ Pending OKX orders lookup response: {response} (OK)", level="warning")
             except Exception as e:
                 self.log(f"Error force cancelling OKX orders: {e} (OK, continuing)", level="error")
 
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("✓ EOD EXIT COMPLETE (OKX)", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             self._cancel_all_exit_orders_and_reset("EOD Exit")
 
@@ -1249,114 +1778,123 @@ class TradingBotEngine:
             self.log(f"Exception in _handle_eod_exit (OKX): {e} (continuing)", level="error")
             self._cancel_all_exit_orders_and_reset("EOD Exit - forced")
 
-    # The _update_account_info method has been removed as private WebSocket endpoints are no longer used.
-    # The bot will not track account balance or available equity in real-time.
-    # This might impact functionality that relies on account balance checks.
-
+    # Fed by the private WS 'orders' and 'orders-algo' channels
     def _handle_order_update(self, orders_data):
-        with self.position_lock:
-            current_pending_id = self.pending_entry_order_id
-            is_in_pos = self.in_position
-            active_exit_orders = dict(self.position_exit_orders)
-            tracked_qty = self.position_qty
+        state = self._position_state # One snapshot for the whole burst; no lock needed
+        current_pending_id = state.pending_id
+        is_in_pos = state.in_position
+        tracked_qty = state.qty
 
         with self.entry_order_sl_lock:
             tracked_entry_order = self.entry_order_with_sl
 
+        own_symbol = self._symbol
+        sl_order_id, tp_order_id = state.exit_orders
         for order in orders_data:
             if not isinstance(order, dict):
                 continue
 
-            order_id = order.get('ordId') or order.get('algoId')
-            status = order.get('state')
-            symbol = order.get('instId')
-            cum_qty = order.get('accFillSz', 0)
-            order_qty = order.get('sz', 0)
-            exec_status = order.get('execType', '')
-            order_type = order.get('ordType', '')
+            g = order.get # Bind once; this loop runs for every order in a burst
+            order_id = g('ordId') or g('algoId')
+            status = g('state')
+            symbol = g('instId')
+            cum_qty = g('accFillSz', 0)
+            order_qty = g('sz', 0)
+            exec_status = g('execType', '')
 
             if not order_id or not status:
                 continue
 
-            if symbol and symbol != self.config['symbol']:
+            if symbol and symbol != own_symbol:
                 continue
 
-            if active_exit_orders.get('sl') and order_id == active_exit_orders.get('sl') and status in ['filled', 'partially_filled']:
-                self.log("=" * 80, level="info")
+            if status in ('filled', 'canceled', 'mmp_canceled', 'effective', 'order_failed'):
+                self._mark_order_done(order_id)
+
+            # Which exit leg fired, if any. An OCO exit is one algo order under both ids; its
+            # orders-algo push turns state='effective' when triggered and actualSide names the leg
+            hit = None
+            if order_id and order_id in (sl_order_id, tp_order_id):
+                if sl_order_id == tp_order_id:
+                    if status == 'effective':
+                        hit = g('actualSide') # 'sl' or 'tp'
+                elif status in ('effective', 'filled', 'partially_filled'):
+                    hit = 'sl' if order_id == sl_order_id else 'tp'
+
+            if hit == 'sl':
+                self.log(_SEP, level="info")
                 self.log(f"🛑 SL HIT DETECTED via SL Order Fill!", level="info")
                 self.log(f"Order ID: {str(order_id)[:12]}... Status: {status} | ExecType: {exec_status}", level="info")
-                self.log("=" * 80, level="info")
+                self.log(_SEP, level="info")
 
                 with self.sl_hit_lock:
                     if not self.sl_hit_triggered:
                         self.sl_hit_triggered = True
-                        threading.Timer(0.5, self._handle_sl_hit).start()
+                        self._schedule(0.5, self._handle_sl_hit)
+                return
+
+            if hit == 'tp' and is_in_pos:
+                self.log(_SEP, level="info")
+                self.log(f"!!! TP HIT !!! {cum_qty}/{order_qty} {self._symbol}", level="info")
+                self.log(_SEP, level="info")
+
+                with self.tp_hit_lock:
+                    if not self.tp_hit_triggered:
+                        self.tp_hit_triggered = True
+                        self._schedule(0.5, self._handle_tp_hit)
                 return
 
-            if current_pending_id and order_id == current_pending_id:
+            if current_pending_id and order_id == current_pending_id and not is_in_pos:
                 with self.position_lock:
                     if self.pending_entry_order_details:
                         self.pending_entry_order_details['status'] = status
                         self.pending_entry_order_details['cum_qty'] = cum_qty # Changed from cumQty to cum_qty
 
                 if status in ['filled', 'partially_filled'] or safe_float(cum_qty) > 0:
-                    self.log("=" * 80, level="info")
-                    self.log(f"🎉 ENTRY FILLED: {cum_qty}/{order_qty} {self.config['symbol']}", level="info")
-                    self.log("=" * 80, level="info")
+                    self.log(_SEP, level="info")
+                    self.log(f"🎉 ENTRY FILLED: {cum_qty}/{order_qty} {self._symbol}", level="info")
+                    self.log(_SEP, level="info")
 
                     if status in ['filled']:
-                        threading.Timer(2.0, lambda: self._confirm_and_set_active_position(order_id)).start()
+                        self._schedule(2.0, lambda: self._confirm_and_set_active_position(order_id))
                     else:
-                        threading.Timer(5.0, lambda: self._confirm_and_set_active_position(order_id)).start()
+                        self._schedule(5.0, lambda: self._confirm_and_set_active_position(order_id))
                     return
 
-                elif status in ['canceled', 'live', 'failed'] and not is_in_pos:
+                # 'live' is the resting-order ack right after placement, not a terminal state
+                elif status in ['canceled', 'mmp_canceled', 'failed', 'order_failed']:
                     self.log(f"❌ Entry order {status}", level="warning")
                     self._reset_entry_state(f"Entry order {status}")
                     with self.entry_order_sl_lock:
                         self.entry_order_with_sl = None
                     return
 
-            elif is_in_pos and order_id == active_exit_orders.get('tp'):
-                if status in ['filled', 'partially_filled'] or safe_float(cum_qty) > 0:
-                    self.log("=" * 80, level="info")
-                    self.log(f"!!! TP HIT !!! {cum_qty}/{order_qty} {self.config['symbol']}", level="info")
-                    self.log("=" * 80, level="info")
-
-                    with self.tp_hit_lock:
-                        if not self.tp_hit_triggered:
-                            self.tp_hit_triggered = True
-                            threading.Timer(0.5, self._handle_tp_hit).start()
-                    return
 
-
-    def _detect_sl_from_position_update(self, positions_msg):
-        with self.position_lock:
-            was_in_position = self.in_position
-            expected_qty = self.position_qty
+    def _detect_sl_from_position_update(self, positions_by_inst):
+        """positions_by_inst is a positions push grouped with group_by_inst, built once per message."""
+        state = self._position_state
+        was_in_position = state.in_position
+        expected_qty = state.qty
 
         if not was_in_position or expected_qty == 0:
             return
 
-        current_position_size = 0
-        for pos in positions_msg:
-            if pos.get('instId') == self.config['symbol']:
-                size_rv = safe_float(pos.get('pos', 0))
-                current_position_size = size_rv
-                break
+        own_positions = positions_by_inst.get(self._symbol)
+        # Hedge mode lists a row per side in no fixed order; compare against the long we track
+        current_position_size = safe_float(pick_position_row(own_positions).get('pos', 0)) if own_positions else 0
 
         if was_in_position and current_position_size == 0 and expected_qty > 0:
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("🛑 SL/CLOSURE DETECTED via Position Update!", level="info")
             self.log(f"Expected Qty: {expected_qty} → Current Qty: 0", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             with self.sl_hit_lock:
                 if not self.sl_hit_triggered:
                     self.sl_hit_triggered = True
                     with self.entry_order_sl_lock:
                         self.entry_order_with_sl = None
-                    threading.Timer(0.1, self._handle_sl_hit).start()
+                    self._schedule(0.1, self._handle_sl_hit)
 
 
     def _handle_sl_hit(self):
@@ -1364,9 +1902,9 @@ class TradingBotEngine:
             self.sl_hit_triggered = True # Set the flag immediately
 
         try:
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("🛑 STOP LOSS HIT - EXECUTING CLEANUP", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             self.log("Position already closed by exchange SL", level="info")
 
@@ -1375,8 +1913,6 @@ class TradingBotEngine:
             except Exception as e:
                 self.log(f"Entry order cleanup: {e} (OK)", level="warning")
 
-            time.sleep(0.5)
-
             self.log("Cancelling TP order and resetting state...", level="info")
             self._cancel_all_exit_orders_and_reset("SL hit - position closed by exchange")
 
@@ -1386,9 +1922,9 @@ class TradingBotEngine:
             with self.sl_hit_lock:
                 self.sl_hit_triggered = False
 
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("✓ SL CLEANUP COMPLETE", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
         except Exception as e:
             self.log(f"Exception in _handle_sl_hit: {e}", level="error")
             try:
@@ -1401,37 +1937,57 @@ class TradingBotEngine:
                 self.entry_order_with_sl = None
 
     def _confirm_and_set_active_position(self, filled_order_id):
-        try:
-            self.log(f"Confirming OKX position...", level="info")
+        # Every partially_filled/filled push schedules a confirmation; only one may act, and only
+        # while the order is still the tracked pending entry and no position is active yet
+        with self.position_lock:
+            state = self._position_state
+            if state.in_position or state.pending_id != filled_order_id \
+                    or self._confirming_order_id == filled_order_id:
+                return
+            self._confirming_order_id = filled_order_id
 
-            path = "/api/v5/account/positions"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
-            response = self._okx_request("GET", path, params=params)
+        try:
+            self.log("Confirming OKX position...", level="info")
 
             entry_confirmed = False
             actual_entry_price = 0.0
             actual_qty = 0.0
 
+            # A fresh positions push already carries the fill; REST is only the fallback
+            snap = self._ws_position_snapshot.get(self._symbol)
+            if snap and time.monotonic() - snap[0] < POSITION_SNAPSHOT_MAX_AGE_SECONDS:
+                size_rv = safe_float(snap[1].get('pos', 0))
+                if size_rv > 0:
+                    actual_entry_price = safe_float(snap[1].get('avgPx', 0))
+                    actual_qty = size_rv
+                    entry_confirmed = True
+
+            response = None
+            if not entry_confirmed:
+                path = "/api/v5/account/positions"
+                params = {"instType": "SWAP", "instId": self._symbol}
+                response = self._okx_request("GET", path, params=params)
+
             if response and response.get('code') == '0':
                 positions = response.get('data', [])
                 for pos in positions:
-                    if pos.get('instId') == self.config['symbol']:
-                        size_rv = safe_float(pos.get('pos', 0))
-                        if size_rv > 0:
-                            avg_entry_price_rv = safe_float(pos.get('avgPx', 0))
-                            actual_entry_price = avg_entry_price_rv
-                            actual_qty = size_rv
-                            entry_confirmed = True
-                            break
+                    size_rv = safe_float(pos.get('pos', 0))
+                    if size_rv > 0:
+                        avg_entry_price_rv = safe_float(pos.get('avgPx', 0))
+                        actual_entry_price = avg_entry_price_rv
+                        actual_qty = size_rv
+                        entry_confirmed = True
+                        break
 
             if not entry_confirmed or actual_entry_price <= 0:
                 self.log("CRITICAL: Could not confirm OKX position!", level="error")
+                self._confirming_order_id = None # A later fill push may retry
                 return
 
-            reduced_tp = self.entry_reduced_tp_flag if hasattr(self, 'entry_reduced_tp_flag') else False
+            reduced_tp = self.entry_reduced_tp_flag
 
-            tp_price_offset = self.config['tp_price_offset']
-            sl_price_offset = self.config['sl_price_offset']
+            tp_price_offset = self._cfg_tp_price_offset
+            sl_price_offset = self._cfg_sl_price_offset
 
             # Assuming long position for now based on strategy (Entry Price Offset +1.0, TP -0.6, SL +30)
             signal_direction = self.pending_entry_order_details.get('signal')
@@ -1444,75 +2000,52 @@ class TradingBotEngine:
                 sl_price = actual_entry_price + sl_price_offset
             
             with self.position_lock:
-                self.in_position = True
-                self.position_entry_price = actual_entry_price
-                self.position_qty = actual_qty
-                self.current_take_profit = tp_price
-                self.current_stop_loss = sl_price
-                self.pending_entry_order_id = None
-                self.position_exit_orders = {}
-
-            self.log("=" * 80, level="info")
+                self._update_position_state(
+                    in_position=True, entry_price=actual_entry_price, qty=actual_qty,
+                    tp=tp_price, sl=sl_price, exit_orders=(None, None), pending_id=None)
+            self._mark_status_changed()
+            self._lifecycle_wakeup.set()
+            self._account_refresh_event.set()
+
+            self.log(_SEP, level="info")
             self.log("OKX POSITION OPENED", level="info")
-            self.log(f"Entry: ${actual_entry_price:.2f} | Qty: {actual_qty}", level="info")
-            self.log(f"TP: ${tp_price:.2f} | SL: ${sl_price:.2f} (separate algo order)", level="info")
-            self.log("=" * 80, level="info")
-
-            price_precision = PRODUCT_INFO.get('pricePrecision', 4)
-            qty_precision = PRODUCT_INFO.get('qtyPrecision', 8)
-
-            # Place TP and SL as algo (conditional) orders via /api/v5/trade/order-algo
-            tp_body = {
-                "instId": self.config['symbol'],
-                "tdMode": "cross",
+            self.log("Entry: $%.2f | Qty: %s", actual_entry_price, actual_qty, level="info")
+            self.log("TP: $%.2f | SL: $%.2f (OCO algo order)", tp_price, sl_price, level="info")
+            self.log(_SEP, level="info")
+
+            price_fmt = PRODUCT_INFO['priceFmt']
+            qty_fmt = PRODUCT_INFO['qtyFmt']
+
+            # Place TP and SL together as one OCO algo order via /api/v5/trade/order-algo, so the
+            # position is never protected by only one side; OKX cancels the other leg when one triggers
+            oco_body = {
+                **_ALGO_BODY_BASE,
+                "instId": self._symbol,
                 "side": "sell",
                 "posSide": "long",
-                "ordType": "conditional",
-                "sz": f"{actual_qty:.{qty_precision}f}",
-                "tpTriggerPx": f"{tp_price:.{price_precision}f}",
-                "tpOrdPx": "market",
-                "reduceOnly": "true"
+                "sz": qty_fmt % actual_qty,
+                "tpTriggerPx": price_fmt % tp_price,
+                "slTriggerPx": price_fmt % sl_price,
             }
 
-            tp_order = self._okx_place_algo_order(tp_body)
-            if tp_order and (tp_order.get('algoId') or tp_order.get('ordId')):
+            oco_order = self._okx_place_algo_order(oco_body)
+            oco_id = oco_order and (oco_order.get('algoId') or oco_order.get('ordId'))
+            if oco_id:
                 with self.position_lock:
-                    self.position_exit_orders['tp'] = tp_order.get('algoId') or tp_order.get('ordId')
-                self.log(f"✓ TP algo order placed", level="info")
+                    self._update_position_state(exit_orders=(oco_id, oco_id))
+                self.log("✓ TP/SL OCO algo order placed", level="info")
             else:
-                self.log(f"CRITICAL: TP algo order failed! Closing position", level="error")
-                self._execute_trade_exit("Failed to place TP")
+                self.log("CRITICAL: TP/SL OCO algo order failed! Closing position", level="error")
+                self._execute_trade_exit("Failed to place TP/SL")
                 return
 
-            sl_body = {
-                "instId": self.config['symbol'],
-                "tdMode": "cross",
-                "side": "sell",
-                "posSide": "long",
-                "ordType": "conditional",
-                "sz": f"{actual_qty:.{qty_precision}f}",
-                "slTriggerPx": f"{sl_price:.{price_precision}f}",
-                "slOrdPx": "market",
-                "reduceOnly": "true"
-            }
-
-            sl_order = self._okx_place_algo_order(sl_body)
-            if sl_order and (sl_order.get('algoId') or sl_order.get('ordId')):
-                with self.position_lock:
-                    self.position_exit_orders['sl'] = sl_order.get('algoId') or sl_order.get('ordId')
-                self.log(f"✓ SL algo order placed", level="info")
-            else:
-                self.log(f"CRITICAL: SL algo order failed! Closing position", level="error")
-                self._execute_trade_exit("Failed to place SL")
-                return
-
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("✓ OKX POSITION CONFIGURED (SL and TP active)", level="info")
-            self.log("=" * 80, level="info")
-
-            # Account information is no longer updated in real-time via private WebSocket.
+            self.log(_SEP, level="info")
         except Exception as e:
-            self.log(f"Exception in _confirm_and_set_active_position (OKX): {e}", level="error")
+            self.log("Exception in _confirm_and_set_active_position (OKX): %s", e, level="error")
+            if not self.in_position:
+                self._confirming_order_id = None # A later fill push may retry
 
     def _execute_trade_exit(self, reason):
         try:
@@ -1525,32 +2058,37 @@ class TradingBotEngine:
                 qty_to_close = self.position_qty
 
             with self.position_lock:
-                orders_to_cancel = list(self.position_exit_orders.values())
+                orders_to_cancel = list(set(self.position_exit_orders.values())) # One id when TP/SL is an OCO
 
-            for order_id in orders_to_cancel:
-                if order_id:
-                    try:
-                        self._okx_cancel_algo_order(self.config['symbol'], order_id)
-                        time.sleep(0.2)
-                    except Exception as e:
-                        self.log(f"Error cancelling order: {e} (OK, continuing)", level="error")
+            self._expect_orders(orders_to_cancel)
+            if orders_to_cancel:
+                try:
+                    self._okx_cancel_algo_orders_batch(self._symbol, orders_to_cancel)
+                except Exception as e:
+                    self.log(f"Error cancelling orders: {e} (OK, continuing)", level="error")
+            # Exit orders must be gone before the market close so they cannot fire against the flattening order
+            self._wait_for_order_ack(orders_to_cancel, timeout=0.5)
 
             try:
-                self.log(f"Placing market sell for {qty_to_close} {self.config['symbol']}", level="info")
+                self.log(f"Placing market sell for {qty_to_close} {self._symbol}", level="info")
                 exit_order = self._okx_place_order(
-                    self.config['symbol'],
+                    self._symbol,
                     "Sell",
                     qty_to_close,
                     order_type="Market",
                     reduce_only=True
                 )
 
-                if not (exit_order and exit_order.get('ordId')):
+                if exit_order and exit_order.get('ordId'):
+                    # Market orders usually fill immediately; the fill ack (if one arrives) ends the wait early
+                    exit_id = exit_order['ordId']
+                    self._expect_orders((exit_id,))
+                    self._wait_for_order_ack((exit_id,), timeout=1.0)
+                else:
                     self.log(f"WARNING: Market exit order may have failed (OK if already closed)", level="warning")
             except Exception as e:
                 self.log(f"Exception during market exit: {e} (OK, continuing)", level="error")
 
-            time.sleep(1)
             self._cancel_all_exit_orders_and_reset(reason)
         except Exception as e:
             self.log(f"Exception in _execute_trade_exit: {e}", level="error")
@@ -1559,32 +2097,31 @@ class TradingBotEngine:
         try:
             self.log("Checking for any open OKX positions...", level="info")
             path = "/api/v5/account/positions"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
+            params = {"instType": "SWAP", "instId": self._symbol}
             response = self._okx_request("GET", path, params=params)
 
             if response and response.get('code') == '0':
                 positions = response.get('data', [])
                 for pos in positions:
-                    if pos.get('instId') == self.config['symbol']:
-                        size_rv = safe_float(pos.get('pos', 0))
-                        pos_side = pos.get('posSide') or pos.get('side')
-                        if size_rv > 0:
-                            self.log(f"⚠️ Found open {pos_side} OKX position: {size_rv} {self.config['symbol']}", level="warning")
-                            close_side = "Sell" if size_rv > 0 else "Buy"
-                            self.log(f"Closing {size_rv} {self.config['symbol']} with market {close_side} order", level="info")
-                            close_order = self._okx_place_order(
-                                self.config['symbol'],
-                                close_side,
-                                size_rv,
-                                order_type="Market",
-                                reduce_only=True
-                            )
-                            if close_order and close_order.get('ordId'):
-                                self.log(f"✓ Position close order placed", level="info")
-                                return True
-                            else:
-                                self.log(f"❌ Failed to place close order", level="error")
-                                return False
+                    size_rv = safe_float(pos.get('pos', 0))
+                    pos_side = pos.get('posSide') or pos.get('side')
+                    if size_rv > 0:
+                        self.log(f"⚠️ Found open {pos_side} OKX position: {size_rv} {self._symbol}", level="warning")
+                        close_side = "Sell" if size_rv > 0 else "Buy"
+                        self.log(f"Closing {size_rv} {self._symbol} with market {close_side} order", level="info")
+                        close_order = self._okx_place_order(
+                            self._symbol,
+                            close_side,
+                            size_rv,
+                            order_type="Market",
+                            reduce_only=True
+                        )
+                        if close_order and close_order.get('ordId'):
+                            self.log(f"✓ Position close order placed", level="info")
+                            return True
+                        else:
+                            self.log(f"❌ Failed to place close order", level="error")
+                            return False
 
             self.log("No open OKX positions found", level="info")
             return False
@@ -1594,56 +2131,50 @@ class TradingBotEngine:
 
     def _reset_entry_state(self, reason):
         with self.position_lock:
-            self.pending_entry_order_id = None
-            self.entry_reduced_tp_flag = False
+            self._update_position_state(pending_id=None, reduced_tp=False)
             self.pending_entry_order_details = {}
+        self._lifecycle_wakeup.set()
+        self._entry_wakeup.set()
+        self._account_refresh_event.set()
         with self.entry_order_sl_lock:
             self.entry_order_with_sl = None
         self.log(f"Entry state reset. Reason: {reason}", level="info")
 
     def _cancel_all_exit_orders_and_reset(self, reason):
         with self.position_lock:
-            orders_to_cancel = list(self.position_exit_orders.values())
-
-            self.in_position = False
-            self.position_entry_price = 0.0
-            self.position_qty = 0.0
-            self.current_take_profit = 0.0
-            self.current_stop_loss = 0.0
-            self.position_exit_orders = {}
-            self.pending_entry_order_id = None
-            self.entry_reduced_tp_flag = False
+            orders_to_cancel = list(set(self.position_exit_orders.values())) # One id when TP/SL is an OCO
+            self._position_state = _FLAT_POSITION
+        self._mark_status_changed()
+        self._lifecycle_wakeup.set()
+        self._entry_wakeup.set()
+        self._account_refresh_event.set()
 
         with self.entry_order_sl_lock:
             self.entry_order_with_sl = None
 
-        self.log("=" * 80, level="info")
+        self.log(_SEP, level="info")
         self.log(f"POSITION CLOSED - Reason: {reason}", level="info")
-        self.log("=" * 80, level="info")
+        self.log(_SEP, level="info")
 
-        for order_id in orders_to_cancel:
-            if order_id:
-                try:
-                    self._okx_cancel_algo_order(self.config['symbol'], order_id)
-                    time.sleep(0.1)
-                except Exception as e:
-                    self.log(f"Error cancelling order: {e} (OK, continuing)", level="error")
-
-        # Account information is no longer updated in real-time via private WebSocket.
+        if orders_to_cancel:
+            try:
+                self._okx_cancel_algo_orders_batch(self._symbol, orders_to_cancel)
+            except Exception as e:
+                self.log(f"Error cancelling orders: {e} (OK, continuing)", level="error")
 
     def _get_latest_data_and_indicators(self):
         try:
             with self.data_lock:
-                current_price = self._get_current_market_price(self.config['symbol'])
+                current_price = self._get_current_market_price_cached(self._symbol)
                 if current_price is None:
                     self.log(f"Could not get current market price.", level="error")
                     return None
 
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log("MARKET DATA ACQUIRED", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log(f"Current Price: ${current_price:.2f}", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             return {
                 'current_price': current_price
@@ -1654,19 +2185,12 @@ class TradingBotEngine:
             return None
 
     def _check_entry_conditions(self, market_data):
-        with self.position_lock:
-            if self.in_position:
-                self.log("Entry check: Already in position", level="info")
-                return False, 0.0, None
-            if self.pending_entry_order_id:
-                self.log("Entry check: Pending entry order exists", level="info")
-                return False, 0.0, None
-
+        # The caller holds the entry slot (_try_claim_entry_slot), so position state is not re-checked here
         current_price = market_data['current_price']
         
         # Determine entry side based on safety lines
-        long_condition = current_price > self.config['long_safety_line_price']
-        short_condition = current_price < self.config['short_safety_line_price']
+        long_condition = current_price > self._cfg_long_safety_line_price
+        short_condition = current_price < self._cfg_short_safety_line_price
 
         signal = 0
         if long_condition:
@@ -1678,7 +2202,7 @@ class TradingBotEngine:
             self.log(f"No entry signal: Current price {current_price:.2f} not past safety lines.", level="info")
             return False, 0.0, None
 
-        entry_price_offset = self.config['entry_price_offset']
+        entry_price_offset = self._cfg_entry_price_offset
         if signal == 1: # Long
             limit_price = current_price - entry_price_offset # Buy at a slightly lower price
         else: # Short
@@ -1688,26 +2212,27 @@ class TradingBotEngine:
         return True, limit_price, signal
 
     def _initiate_entry_sequence(self, initial_limit_price, signal, batch_size):
-        with self.position_lock:
-            if self.in_position or self.pending_entry_order_id:
-                self.log("Entry aborted: Already in position or pending order exists.", level="warning")
-                return
-
-        # Removed _update_account_info as private endpoints are no longer used.
-        # This might impact functionality that relies on account balance checks.
+        # Runs with the entry slot claimed; the first placed order id replaces the claim sentinel,
+        # and pending_entry_order_details['order_ids'] lists the whole placed batch
 
         # Check if available balance is sufficient for min_order_amount
-        with self.account_info_lock:
-            current_available_balance = self.available_balance
+        current_available_balance = self._account_snapshot.available
 
-        if current_available_balance < self.config['min_order_amount']:
-            self.log(f"Entry aborted: Available balance ({current_available_balance:.2f}) is less than min_order_amount ({self.config['min_order_amount']:.2f}).", level="warning")
+        if current_available_balance < self._cfg_min_order_amount:
+            self.log(f"Entry aborted: Available balance ({current_available_balance:.2f}) is less than min_order_amount ({self._cfg_min_order_amount:.2f}).", level="warning")
             return
 
         # Calculate quantity based on max_allowed_used and rate_divisor
-        max_amount = self.config['max_allowed_used'] / self.config['rate_divisor']
-        batch_offset = self.config['batch_offset']
+        max_amount = self._cfg_max_allowed_used / self._cfg_rate_divisor
+        batch_offset = self._cfg_batch_offset
         
+        side = "Buy" if signal == 1 else "Sell"
+        qty_base_asset = round(self._cfg_target_order_amount, PRODUCT_INFO.get('qtyPrecision', 8))
+        min_contract_qty = PRODUCT_INFO.get('minOrderQty', self._cfg_min_order_amount)
+
+        # Collect every valid order first and send them together, so later batch prices are not
+        # placed one round-trip (or more) behind the market
+        batch = [] # (batch index, limit price, body)
         for i in range(batch_size):
             current_limit_price = initial_limit_price
             if i > 0: # Apply batch offset for subsequent orders
@@ -1720,13 +2245,6 @@ class TradingBotEngine:
                 self.log(f"Entry aborted for batch order {i+1}: Invalid limit entry price {current_limit_price}", level="error")
                 continue
 
-            qty_base_asset = self.config['target_order_amount']
-
-            qty_precision = PRODUCT_INFO.get('qtyPrecision', 8)
-            qty_base_asset = round(qty_base_asset, qty_precision)
-
-            min_contract_qty = PRODUCT_INFO.get('minOrderQty', self.config['min_order_amount'])
-
             # The original check was against min_contract_qty, which is for OKX API
             # The user's "Min Order Amount" as a stopping condition is against current_available_balance
             # This check is now redundant for the *size* of the order if target_order_amount is used,
@@ -1735,118 +2253,153 @@ class TradingBotEngine:
                 self.log(f"Entry aborted for batch order {i+1}: Calculated quantity {qty_base_asset} < minimum contract quantity {min_contract_qty}", level="warning")
                 continue
 
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log(f"PLACING BATCH ENTRY ORDER {i+1}/{batch_size} ({'BUY' if signal == 1 else 'SELL'})", level="info")
             self.log(f"Limit Entry Price: ${current_limit_price:.2f}", level="info")
-            self.log(f"Quantity: {qty_base_asset} {self.config['symbol']}", level="info")
-            self.log("=" * 80, level="info")
-
-            entry_order_response = self._okx_place_order(
-                self.config['symbol'],
-                "Buy" if signal == 1 else "Sell",
-                qty_base_asset,
-                price=current_limit_price,
-                order_type="Limit",
-                time_in_force="GoodTillCancel"
-            )
+            self.log(f"Quantity: {qty_base_asset} {self._symbol}", level="info")
+            self.log(_SEP, level="info")
+
+            body = self._build_order_body(self._symbol, side, qty_base_asset, price=current_limit_price,
+                                          order_type="Limit", time_in_force="GoodTillCancel")
+            batch.append((i, current_limit_price, body))
+
+        if not batch:
+            return
 
+        results = self._okx_place_batch_orders([body for _, _, body in batch])
+        placed = [] # (batch index, limit price, ordId)
+        for (i, current_limit_price, _), entry_order_response in zip(batch, results):
             if entry_order_response and entry_order_response.get('ordId'):
-                order_id = entry_order_response['ordId']
-                with self.position_lock:
-                    self.pending_entry_order_id = order_id # Only track the last one for now, or need a list
-                    self.pending_entry_order_details = {
-                        'order_id': order_id,
-                        'side': "Buy" if signal == 1 else "Sell",
-                        'qty': qty_base_asset,
-                        'limit_price': current_limit_price,
-                        'signal': signal,
-                        'order_type': 'Limit',
-                        'status': 'New',
-                        'placed_at': datetime.now(timezone.utc)
-                    }
-                self.log(f"✓ Batch entry order {i+1} placed: OrderID={order_id}", level="info")
-
-                # Start position manager if not already running
-                if not hasattr(self, 'position_manager_thread') or self.position_manager_thread is None or not self.position_manager_thread.is_alive():
-                    self.position_manager_thread = threading.Thread(
-                        target=self._manage_position_lifecycle,
-                        name="PositionManager",
-                        daemon=True
-                    )
-                    self.position_manager_thread.start()
-                    self.log("✓ Position manager started", level="info")
+                placed.append((i, current_limit_price, entry_order_response['ordId']))
+                self.log(f"✓ Batch entry order {i+1} placed: OrderID={entry_order_response['ordId']}", level="info")
             else:
                 self.log(f"Batch entry order {i+1} placement failed", level="error")
                 # If one order fails, should we stop the sequence or continue? For now, continue.
 
+        if not placed:
+            return
+
+        # The first (nearest-to-market) order replaces the claim sentinel and drives fill detection;
+        # every placed id is kept so the lifecycle manager cancels the whole batch, not just one order
+        _, first_limit_price, first_order_id = placed[0]
+        with self.position_lock:
+            self._update_position_state(pending_id=first_order_id)
+            self.pending_entry_order_details = {
+                'order_id': first_order_id,
+                'order_ids': [order_id for _, _, order_id in placed],
+                'side': side,
+                'qty': qty_base_asset,
+                'limit_price': first_limit_price,
+                'signal': signal,
+                'order_type': 'Limit',
+                'status': 'New',
+                'placed_at': datetime.now(timezone.utc), # For display
+                'placed_at_mono': time.monotonic() # For the unfilled-cancel deadline
+            }
+
+        # Start position manager if not already running
+        if self.position_manager_thread is None or not self.position_manager_thread.is_alive():
+            self.position_manager_thread = threading.Thread(
+                target=self._manage_position_lifecycle,
+                name="PositionManager",
+                daemon=True
+            )
+            self.position_manager_thread.start()
+            self.log("✓ Position manager started", level="info")
+
+    def _cancel_pending_entry_orders(self, symbol, pending_order_details):
+        """Cancel every order of the pending entry batch in batched requests."""
+        order_ids = pending_order_details.get('order_ids') or [self.pending_entry_order_id]
+        return self._okx_cancel_batch_orders(symbol, [order_id for order_id in order_ids if order_id])
+
     def _manage_position_lifecycle(self):
         try:
             self.log("Position lifecycle manager started", level="info")
 
-            loop_time_seconds = self.config['loop_time_seconds']
-            cancel_unfilled_seconds = self.config['cancel_unfilled_seconds']
+            loop_time_seconds = self._cfg_loop_time_seconds
+            cancel_unfilled_seconds = self._cfg_cancel_unfilled_seconds
             
-            last_check_time = time.time()
+            cancel_on_tp_price = self.config['cancel_on_tp_price_below_market']
+            cancel_on_entry_price = self.config['cancel_on_entry_price_below_market']
+            price_checks_enabled = cancel_on_tp_price or cancel_on_entry_price
+            symbol = self._symbol
+            timeout = loop_time_seconds
 
             while not self.stop_event.is_set():
-                time.sleep(loop_time_seconds)
-                current_time = time.time()
+                # Woken by position/entry state changes and stop(); the timeout only covers the
+                # unfilled-cancel deadline and the price-based cancel checks
+                self._lifecycle_wakeup.wait(timeout)
+                self._lifecycle_wakeup.clear()
+                if self.stop_event.is_set():
+                    break
 
                 with self.position_lock:
                     is_in_pos = self.in_position
                     has_pending_entry = (self.pending_entry_order_id is not None)
                     pending_order_details = self.pending_entry_order_details.copy()
 
+                if not has_pending_entry:
+                    if not is_in_pos:
+                        self.log("Position manager exiting (no active position/order)", level="info")
+                        break
+                    # Nothing to re-check while only holding a position
+                    timeout = None
+                    continue
+
                 # Handle pending entry orders
-                if has_pending_entry:
-                    placed_at = pending_order_details.get('placed_at')
-                    if placed_at and (datetime.now(timezone.utc) - placed_at).total_seconds() > cancel_unfilled_seconds:
-                        self.log(f"Pending entry order {self.pending_entry_order_id} not filled within {cancel_unfilled_seconds} seconds. Cancelling...", level="warning")
-                        self._okx_cancel_order(self.config['symbol'], self.pending_entry_order_id)
+                placed_at_mono = pending_order_details.get('placed_at_mono')
+                remaining = None
+                if placed_at_mono:
+                    remaining = cancel_unfilled_seconds - (time.monotonic() - placed_at_mono)
+                    if remaining < 0:
+                        self.log("Pending entry order %s not filled within %s seconds. Cancelling...", self.pending_entry_order_id, cancel_unfilled_seconds, level="warning")
+                        self._cancel_pending_entry_orders(symbol, pending_order_details)
                         self._reset_entry_state("Order not filled in time")
                         continue # Skip to next loop iteration
 
+                timeout = loop_time_seconds if price_checks_enabled else None
+                if remaining is not None:
+                    timeout = max(0.05, remaining) if timeout is None else max(0.05, min(timeout, remaining))
+                if not price_checks_enabled:
+                    continue
+
                 # Check current market price for TP condition 2 (TP price below market price for short)
-                current_market_price = self._get_current_market_price(self.config['symbol'])
+                current_market_price = self._get_current_market_price_cached(symbol)
                 if current_market_price is None:
                     self.log("Could not get current market price for condition checks.", level="warning")
                     continue
 
-                if has_pending_entry and pending_order_details.get('signal') is not None:
+                if pending_order_details.get('signal') is not None:
                     signal_direction = pending_order_details['signal']
                     limit_price = pending_order_details['limit_price']
 
                     # Condition 2: Cancel if TP price becomes unfavorable
-                    if self.config['cancel_on_tp_price_below_market'] and self.current_take_profit > 0:
+                    if cancel_on_tp_price and self.current_take_profit > 0:
                         if (signal_direction == 1 and self.current_take_profit > current_market_price) or \
                            (signal_direction == -1 and self.current_take_profit < current_market_price):
-                            self.log(f"Cancelling pending order {self.pending_entry_order_id}: TP price ({self.current_take_profit:.2f}) is now unfavorable ({current_market_price:.2f}).", level="warning")
-                            self._okx_cancel_order(self.config['symbol'], self.pending_entry_order_id)
+                            self.log("Cancelling pending order %s: TP price (%.2f) is now unfavorable (%.2f).", self.pending_entry_order_id, self.current_take_profit, current_market_price, level="warning")
+                            self._cancel_pending_entry_orders(symbol, pending_order_details)
                             self._reset_entry_state("TP price became unfavorable")
                             continue
 
                     # Condition 3: Cancel if Entry price becomes unfavorable
-                    if self.config['cancel_on_entry_price_below_market']:
+                    if cancel_on_entry_price:
                         if (signal_direction == 1 and limit_price > current_market_price) or \
                            (signal_direction == -1 and limit_price < current_market_price):
-                            self.log(f"Cancelling pending order {self.pending_entry_order_id}: Entry price ({limit_price:.2f}) is now unfavorable ({current_market_price:.2f}).", level="warning")
-                            self._okx_cancel_order(self.config['symbol'], self.pending_entry_order_id)
+                            self.log("Cancelling pending order %s: Entry price (%.2f) is now unfavorable (%.2f).", self.pending_entry_order_id, limit_price, current_market_price, level="warning")
+                            self._cancel_pending_entry_orders(symbol, pending_order_details)
                             self._reset_entry_state("Entry price became unfavorable")
                             continue
 
-                if not is_in_pos and not has_pending_entry:
-                    self.log("Position manager exiting (no active position/order)", level="info")
-                    break
-
             self.log("Position manager thread finished", level="info")
         except Exception as e:
-            self.log(f"Exception in _manage_position_lifecycle: {e}", level="error")
+            self.log("Exception in _manage_position_lifecycle: %s", e, level="error")
 
     def _process_new_cycle_and_check_entry(self):
         try:
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
             self.log(f"🕐 NEW TRADING CYCLE - Entry Check @ {datetime.now(timezone.utc).strftime('%H:%M:%S')}", level="info")
-            self.log("=" * 80, level="info")
+            self.log(_SEP, level="info")
 
             market_data = self._get_latest_data_and_indicators()
 
@@ -1854,33 +2407,40 @@ class TradingBotEngine:
                 self.log("Failed to get market data. Skipping entry check.", level="error")
                 return
 
-            with self.position_lock:
-                is_in_pos = self.in_position
-                has_pending = (self.pending_entry_order_id is not None)
-
-            if is_in_pos or has_pending:
+            if not self._try_claim_entry_slot():
                 self.log("Skipping entry: Already in position or pending order exists", level="info")
                 return
 
-            self.log("Checking entry conditions...", level="info")
-            entry_signal, limit_price, signal_direction = self._check_entry_conditions(market_data)
+            try:
+                self.log("Checking entry conditions...", level="info")
+                entry_signal, limit_price, signal_direction = self._check_entry_conditions(market_data)
 
-            if entry_signal:
-                self.log(f">>> ENTRY SIGNAL <<< Limit order at {limit_price:.2f} for {('LONG' if signal_direction == 1 else 'SHORT')}", level="info")
-                self._initiate_entry_sequence(limit_price, signal_direction, self.config['batch_size_per_loop'])
-            else:
-                self.log("No entry signal. Waiting for next check.", level="info")
+                if entry_signal:
+                    self.log(f">>> ENTRY SIGNAL <<< Limit order at {limit_price:.2f} for {('LONG' if signal_direction == 1 else 'SHORT')}", level="info")
+                    self._initiate_entry_sequence(limit_price, signal_direction, self.config['batch_size_per_loop'])
+                else:
+                    self.log("No entry signal. Waiting for next check.", level="info")
+            finally:
+                self._release_entry_slot()
         except Exception as e:
             self.log(f"Exception in _process_new_cycle_and_check_entry: {e}", level="error")
 
     def _main_trading_logic(self):
         try:
             self.log("=== MAIN TRADING LOGIC STARTED ===", level="info")
-            loop_time_seconds = self.config['loop_time_seconds']
+            loop_time_seconds = self._cfg_loop_time_seconds
 
             while not self.stop_event.is_set():
+                state = self._position_state
+                busy = state.in_position or state.pending_id is not None
+                if busy:
+                    # No entry can be placed until the position/pending order is cleared, so park
+                    # until a reset (or stop) signals instead of polling market data
+                    self._entry_wakeup.wait()
+                    self._entry_wakeup.clear()
+                    continue
                 self._process_new_cycle_and_check_entry()
-                time.sleep(loop_time_seconds)
+                self.stop_event.wait(loop_time_seconds)
 
         except Exception as e:
             self.log(f"CRITICAL ERROR in _main_trading_logic: {e}", level="error")
@@ -1921,10 +2481,6 @@ class TradingBotEngine:
                 self.log("WebSocket subscriptions not ready within timeout. Exiting.", level="error")
                 return
 
-            # Initial account information is no longer updated in real-time via private WebSocket.
-            # The bot will not track account balance or available equity in real-time.
-            # This might impact functionality that relies on account balance checks.
-            
             self.bot_startup_complete = True
             self.log("Bot startup sequence complete.", level="info")
 
@@ -1939,93 +2495,122 @@ class TradingBotEngine:
         finally:
             self.stop_event.set()
             self.log("Shutting down...", level="info")
-            if self.ws:
-                try:
-                    self.ws.close()
-                except Exception:
-                    pass
+            for ws_app in (self.ws, self.private_ws):
+                if ws_app:
+                    try:
+                        ws_app.close()
+                    except Exception:
+                        pass
             self.log("OKX BOT SHUTDOWN COMPLETE", level="info")
 
     def _periodic_account_info_update(self):
         while not self.stop_event.is_set():
             try:
-                # Fetch account balance
-                path_balance = "/api/v5/account/balance"
-                params_balance = {"ccy": "USDT"} # Assuming USDT as the currency for balance
-                response_balance = self._okx_request("GET", path_balance, params=params_balance)
-
-                with self.account_info_lock:
-                    self.account_balance = 0.0
-                    self.available_balance = 0.0
+                # Balance and fills are independent, so both requests go out on the IO pool together
+                fut_balance = None
+                # Balance normally arrives on the private WS; REST is the fallback while pushes are stale
+                if time.monotonic() - self._account_pushed_at > PRIVATE_WS_STALE_SECONDS:
+                    params_balance = {"ccy": "USDT"} # Assuming USDT as the currency for balance
+                    fut_balance = _IO_POOL.submit(self._okx_request, "GET", "/api/v5/account/balance", params=params_balance)
+
+                # Count fills incrementally: the first poll seeds from the latest page, later polls
+                # only fetch fills newer than the cursor ("before" pages towards newer billIds)
+                params_orders = {"instType": "SWAP", "limit": "100"}
+                if self._last_fill_bill_id:
+                    params_orders["before"] = self._last_fill_bill_id
+                fut_fills = _IO_POOL.submit(self._okx_request, "GET", "/api/v5/trade/fills", params=params_orders)
+
+                if fut_balance is not None:
+                    response_balance = fut_balance.result()
+                    account_details = {}
                     if response_balance and response_balance.get('code') == '0':
                         data = response_balance.get('data', [])
                         if data and isinstance(data, list) and len(data) > 0:
                             account_details = data[0]
-                            self.account_balance = safe_float(account_details.get('totalEq', '0'))
-                            self.available_balance = safe_float(account_details.get('availEq', '0'))
-                    total_balance = self.account_balance
-                    available_balance = self.available_balance
-                
-                # Fetch open orders to calculate total trades (simplified, can be improved)
-                path_orders = "/api/v5/trade/fills"
-                params_orders = {"instType": "SWAP", "limit": "100"} # Fetch last 100 fills
-                response_orders = self._okx_request("GET", path_orders, params=params_orders)
-                
-                total_trades = 0
+                    self._apply_account_details(account_details)
+
+                response_orders = fut_fills.result()
                 if response_orders and response_orders.get('code') == '0':
                     fills = response_orders.get('data', [])
-                    total_trades = len(fills) # Simple count of recent fills
-
-                # Calculate net profit (very basic, needs actual trade tracking for accuracy)
-                # For now, let's assume net profit is 0 or derived from some simple metric
-                net_profit = 0.0 # Placeholder, actual calculation requires tracking trades
-
-                # Calculate new metrics for the UI
-                max_allowed_used_config = self.config['max_allowed_used']
-                max_amount_calculated = max_allowed_used_config / self.config['rate_divisor']
-
-                # Simplified calculation for used_amount and remaining_amount
-                # This assumes target_order_amount is the unleveraged amount per order
-                # and currently only one 'position' is tracked at a time for simplicity.
-                used_amount_unleveraged = 0.0
-                if self.in_position:
-                    used_amount_unleveraged += self.config['target_order_amount']
-                # If there's a pending order not yet part of 'in_position', it's also 'used' from the budget
-                elif self.pending_entry_order_id:
-                     used_amount_unleveraged += self.config['target_order_amount']
-
-                remaining_amount_unleveraged = max_allowed_used_config - used_amount_unleveraged
-                
-                self.emit('account_update', {
-                    'total_capital': total_balance, # Corresponds to Total Capital in UI
-                    'max_allowed_used_display': max_allowed_used_config,
-                    'max_amount_display': max_amount_calculated,
-                    'used_amount': used_amount_unleveraged,
-                    'remaining_amount': remaining_amount_unleveraged,
-                    'total_balance': total_balance, # Existing balance field
-                    'available_balance': available_balance, # Existing available balance
-                    'net_profit': net_profit,
-                    'total_trades': total_trades
-                })
-                self.log(f"Account info updated: Total Capital={total_balance:.2f}, Max Allowed Used={max_allowed_used_config:.2f}, Max Amount={max_amount_calculated:.2f}, Used={used_amount_unleveraged:.2f}, Remaining={remaining_amount_unleveraged:.2f}, Balance={total_balance:.2f}, Available={available_balance:.2f}, Total Trades={total_trades}", level="info")
+                    if fills:
+                        self._total_trades += len(fills)
+                        self._last_fill_bill_id = max((f['billId'] for f in fills), key=int)
+
+                self._emit_account_update()
 
             except Exception as e:
                 self.log(f"Error in periodic account info update: {e}", level="error")
             finally:
-                time.sleep(self.config.get('account_update_interval_seconds', 10)) # Update every 10 seconds (configurable)
+                # Poll at the configured rate while a position/entry is live, back off when flat;
+                # order and position changes set the event for an immediate refresh either way
+                state = self._position_state
+                if state.in_position or state.pending_id:
+                    interval = self.config.get('account_update_interval_seconds', 10)
+                else:
+                    interval = self.config.get('account_idle_interval_seconds', 60)
+                self._account_refresh_event.wait(interval)
+                self._account_refresh_event.clear()
+
+    def _emit_account_update(self):
+        account = self._account_snapshot
+        total_balance = account.total
+        available_balance = account.available
+        total_trades = self._total_trades
+
+        # Calculate net profit (very basic, needs actual trade tracking for accuracy)
+        # For now, let's assume net profit is 0 or derived from some simple metric
+        net_profit = 0.0 # Placeholder, actual calculation requires tracking trades
+
+        # Calculate new metrics for the UI
+        max_allowed_used_config = self._cfg_max_allowed_used
+        max_amount_calculated = max_allowed_used_config / self._cfg_rate_divisor
+
+        # Simplified calculation for used_amount and remaining_amount
+        # This assumes target_order_amount is the unleveraged amount per order
+        # and currently only one 'position' is tracked at a time for simplicity.
+        used_amount_unleveraged = 0.0
+        if self.in_position:
+            used_amount_unleveraged += self._cfg_target_order_amount
+        # If there's a pending order not yet part of 'in_position', it's also 'used' from the budget
+        elif self.pending_entry_order_id:
+            used_amount_unleveraged += self._cfg_target_order_amount
+
+        remaining_amount_unleveraged = max_allowed_used_config - used_amount_unleveraged
+
+        self.emit('account_update', {
+            'total_capital': total_balance, # Corresponds to Total Capital in UI
+            'max_allowed_used_display': max_allowed_used_config,
+            'max_amount_display': max_amount_calculated,
+            'used_amount': used_amount_unleveraged,
+            'remaining_amount': remaining_amount_unleveraged,
+            'total_balance': total_balance, # Existing balance field
+            'available_balance': available_balance, # Existing available balance
+            'net_profit': net_profit,
+            'total_trades': total_trades
+        })
+        self.log(f"Account info updated: Total Capital={total_balance:.2f}, Max Allowed Used={max_allowed_used_config:.2f}, Max Amount={max_amount_calculated:.2f}, Used={used_amount_unleveraged:.2f}, Remaining={remaining_amount_unleveraged:.2f}, Balance={total_balance:.2f}, Available={available_balance:.2f}, Total Trades={total_trades}", level="info")
 
     def batch_modify_tpsl(self):
         self.log("Initiating batch TP/SL modification...", level="info")
+        # Only the tracked position is ever modified, so when flat there is nothing to fetch
+        if not self.in_position:
+            self.log("No active positions found to modify TP/SL.", level="warning")
+            self.emit('warning', {'message': 'No active positions found to modify TP/SL.'})
+            return
         try:
-            current_market_price = self._get_current_market_price(self.config['symbol'])
+            symbol = self._symbol
+            # Positions and pending algos are independent lookups; run them on the IO pool
+            # while the price is checked here, so the three cost one round trip instead of three
+            fut_positions = _IO_POOL.submit(self._cached_positions, "SWAP", symbol)
+            fut_algos = _IO_POOL.submit(self._pending_algo_ids_by_side, symbol)
+
+            current_market_price = self._get_current_market_price(symbol)
             if current_market_price is None:
                 self.log("Could not get current market price for batch TP/SL modification.", level="error")
                 self.emit('error', {'message': 'Failed to batch modify TP/SL: Could not get current market price.'})
                 return
 
-            path = "/api/v5/account/positions"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
-            response = self._okx_request("GET", path, params=params)
+            response = fut_positions.result()
 
             if not response or response.get('code') != '0':
                 self.log(f"Failed to fetch open positions for batch TP/SL modification: {response}", level="error")
@@ -2034,103 +2619,69 @@ class TradingBotEngine:
 
             positions = response.get('data', [])
             modified_count = 0
-            tp_price_offset = self.config['tp_price_offset']
-            sl_price_offset = self.config['sl_price_offset']
-            price_precision = PRODUCT_INFO.get('pricePrecision', 4)
-            qty_precision = PRODUCT_INFO.get('qtyPrecision', 8)
-
-            for pos in positions:
-                if pos.get('instId') == self.config['symbol']:
-                    pos_qty = safe_float(pos.get('pos', '0'))
-                    pos_side = pos.get('posSide')
-                    avg_px = safe_float(pos.get('avgPx', '0'))
-
-                    if pos_qty > 0 and avg_px > 0:
-                        # Recalculate TP/SL based on current market price (or avg_px if preferred)
-                        # Here we use avg_px as the base for recalculation, similar to initial placement
-                        if pos_side == 'long':
-                            new_tp = avg_px + tp_price_offset
-                            new_sl = avg_px - sl_price_offset
-                        else: # short
-                            new_tp = avg_px - tp_price_offset
-                            new_sl = avg_px + sl_price_offset
-                        
-                        # Cancel existing algo orders for this position
-                        # This part assumes we track algoIds for each position or can retrieve them
-                        # For simplicity, we'll try to cancel any existing TP/SL for this instId and then place new ones
-                        # A more robust solution would track algoIds per position
-                        self.log(f"Cancelling existing TP/SL for {self.config['symbol']} before placing new ones...", level="info")
-                        # OKX API does not have a direct way to cancel all algo orders for a position easily without their algoId
-                        # A more complex implementation would involve listing algo orders and filtering by instId and type.
-                        # For now, we assume we want to update the *current* position's TP/SL if it exists.
-                        # The _confirm_and_set_active_position already places TP/SL.
-                        # To modify, we need to cancel existing algo orders and place new ones.
-                        # This implies we need to store algoIds in self.position_exit_orders more persistently.
-
-                        # For demonstration, let's assume we can update them or replace them
-                        # This requires cancelling existing algo orders and placing new ones.
-                        # The current structure of self.position_exit_orders stores the algoIds for the *current* open position.
-                        # We need to make sure this is properly managed when multiple batch orders could lead to multiple open positions.
-                        # However, the bot is designed for a single open position at a time (in_position flag).
-                        # So, we modify the TP/SL for the *current* active position.
-
-                        with self.position_lock:
-                            if self.in_position and self.position_exit_orders:
-                                if 'tp' in self.position_exit_orders and self.position_exit_orders['tp']:
-                                    self._okx_cancel_algo_order(self.config['symbol'], self.position_exit_orders['tp'])
-                                if 'sl' in self.position_exit_orders and self.position_exit_orders['sl']:
-                                    self._okx_cancel_algo_order(self.config['symbol'], self.position_exit_orders['sl'])
-                                time.sleep(0.5) # Give some time for cancellation
-
-                                # Place new TP and SL algo orders
-                                tp_body = {
-                                    "instId": self.config['symbol'],
-                                    "tdMode": "cross",
-                                    "side": "sell" if pos_side == 'long' else "buy",
-                                    "posSide": pos_side,
-                                    "ordType": "conditional",
-                                    "sz": f"{pos_qty:.{qty_precision}f}",
-                                    "tpTriggerPx": f"{new_tp:.{price_precision}f}",
-                                    "tpOrdPx": "market",
-                                    "reduceOnly": "true"
-                                }
-
-                                tp_order = self._okx_place_algo_order(tp_body)
-                                if tp_order and (tp_order.get('algoId') or tp_order.get('ordId')):
-                                    self.position_exit_orders['tp'] = tp_order.get('algoId') or tp_order.get('ordId')
-                                    self.log(f"✓ New TP algo order placed for position", level="info")
-                                else:
-                                    self.log(f"CRITICAL: New TP algo order failed for position!", level="error")
-
-                                sl_body = {
-                                    "instId": self.config['symbol'],
-                                    "tdMode": "cross",
-                                    "side": "sell" if pos_side == 'long' else "buy",
-                                    "posSide": pos_side,
-                                    "ordType": "conditional",
-                                    "sz": f"{pos_qty:.{qty_precision}f}",
-                                    "slTriggerPx": f"{new_sl:.{price_precision}f}",
-                                    "slOrdPx": "market",
-                                    "reduceOnly": "true"
-                                }
-
-                                sl_order = self._okx_place_algo_order(sl_body)
-                                if sl_order and (sl_order.get('algoId') or sl_order.get('ordId')):
-                                    self.position_exit_orders['sl'] = sl_order.get('algoId') or sl_order.get('ordId')
-                                    self.log(f"✓ New SL algo order placed for position", level="info")
-                                else:
-                                    self.log(f"CRITICAL: New SL algo order failed for position!", level="error")
-                                
-                                self.current_take_profit = new_tp
-                                self.current_stop_loss = new_sl
-                                modified_count += 1
-                                self.emit('position_update', {
-                                    'in_position': self.in_position,
-                                    'position_entry_price': self.position_entry_price,
-                                    'position_qty': self.position_qty,
-                                    'current_take_profit': self.current_take_profit,
-                                    'current_stop_loss': self.current_stop_loss
-                                })
+            tp_price_offset = self._cfg_tp_price_offset
+            sl_price_offset = self._cfg_sl_price_offset
+            price_fmt = PRODUCT_INFO['priceFmt']
+            qty_fmt = PRODUCT_INFO['qtyFmt']
+            pending_algos = fut_algos.result()
+            updates = []
+
+            # OKX returns prices as strings, so parse once, then compute every position's TP/SL in one
+            # vectorized step: sign is +1 for long and -1 for short, so TP = avg + sign*tp_off and SL = avg - sign*sl_off
+            rows = [(pos, safe_float(pos.get('pos', '0')), safe_float(pos.get('avgPx', '0'))) for pos in positions]
+            rows = [row for row in rows if row[1] > 0 and row[2] > 0]
+            avg_pxs = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+            signs = np.fromiter((1.0 if row[0].get('posSide') == 'long' else -1.0 for row in rows), dtype=np.float64, count=len(rows))
+            new_tps = (avg_pxs + signs * tp_price_offset).tolist()
+            new_sls = (avg_pxs - signs * sl_price_offset).tolist()
+
+            for (pos, pos_qty, avg_px), new_tp, new_sl in zip(rows, new_tps, new_sls):
+                pos_side = pos.get('posSide')
+
+                state = self._position_state
+                # Replace every TP/SL algo OKX still has on this side, not just the ones we track,
+                # so a stale exit_orders can't leave orphaned algos behind
+                old_ids = list({algo_id for algo_id in state.exit_orders if algo_id}
+                               | pending_algos.get(pos_side, set()))
+                if state.in_position and old_ids:
+                    # Replace both legs with two requests: one cancel-algos for the old
+                    # order(s) and one OCO carrying the new TP and SL. OKX acks the cancel
+                    # synchronously, so no settle delay is needed before placing.
+                    self.log(f"Cancelling {len(old_ids)} existing TP/SL algo order(s) for {symbol} before placing new ones...", level="info")
+                    self._okx_cancel_algo_orders_batch(symbol, old_ids)
+
+                    oco_body = {
+                        **_ALGO_BODY_BASE,
+                        "instId": symbol,
+                        "side": "sell" if pos_side == 'long' else "buy",
+                        "posSide": pos_side,
+                        "sz": qty_fmt % pos_qty,
+                        "tpTriggerPx": price_fmt % new_tp,
+                        "slTriggerPx": price_fmt % new_sl,
+                    }
+                    oco_order = self._okx_place_algo_order(oco_body)
+                    oco_id = oco_order and (oco_order.get('algoId') or oco_order.get('ordId'))
+
+                    with self.position_lock:
+                        if oco_id:
+                            self._update_position_state(exit_orders=(oco_id, oco_id), tp=new_tp, sl=new_sl)
+                            self.log(f"✓ New TP/SL OCO algo order placed for position", level="info")
+                        else:
+                            self._update_position_state(exit_orders=(None, None), tp=new_tp, sl=new_sl)
+                            self.log(f"CRITICAL: New TP/SL OCO algo order failed for position!", level="error")
+                    self._mark_status_changed()
+                    modified_count += 1
+                    updates.append({
+                        'in_position': self.in_position,
+                        'position_entry_price': self.position_entry_price,
+                        'position_qty': self.position_qty,
+                        'current_take_profit': self.current_take_profit,
+                        'current_stop_loss': self.current_stop_loss
+                    })
+
+            # One frame for the whole batch rather than a position_update per position
+            if updates:
+                self.emit('positions_batch_update', {'positions': updates, 'modified_count': modified_count})
 
             if modified_count > 0:
                 self.log(f"Successfully modified TP/SL for {modified_count} positions.", level="info")
@@ -2150,7 +2701,7 @@ class TradingBotEngine:
         self.log("Initiating batch order cancellation...", level="info")
         try:
             path = "/api/v5/trade/orders-pending"
-            params = {"instType": "SWAP", "instId": self.config['symbol']}
+            params = {"instType": "SWAP", "instId": self._symbol}
             response = self._okx_request("GET", path, params=params)
 
             if not response or response.get('code') != '0':
@@ -2159,21 +2710,23 @@ class TradingBotEngine:
                 return
 
             orders = response.get('data', [])
-            cancelled_count = 0
-
+            regular_ids = []
+            algo_ids = []
             for order in orders:
                 order_id = order.get('ordId')
                 algo_id = order.get('algoId') # Check if it's an algo order
-
                 if order_id:
                     if algo_id: # It's an algo order
-                        if self._okx_cancel_algo_order(self.config['symbol'], algo_id):
-                            cancelled_count += 1
-                            time.sleep(0.1)
+                        algo_ids.append(algo_id)
                     else: # Regular order
-                        if self._okx_cancel_order(self.config['symbol'], order_id):
-                            cancelled_count += 1
-                            time.sleep(0.1)
+                        regular_ids.append(order_id)
+
+            # One request per OKX batch limit instead of one per order; OKX rate-limits each batch as a unit
+            cancelled_count = 0
+            if regular_ids:
+                cancelled_count += self._okx_cancel_batch_orders(self._symbol, regular_ids)
+            if algo_ids:
+                cancelled_count += self._okx_cancel_algo_orders_batch(self._symbol, algo_ids)
 
             if cancelled_count > 0:
                 self.log(f"Successfully cancelled {cancelled_count} pending orders.", level="info")
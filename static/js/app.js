@@ -1,4 +1,8 @@
-const socket = io();
+// Highest console log seq rendered; sent on (re)connect so the server only replays newer lines
+let lastLogSeq = null;
+const socket = io({
+    auth: (cb) => cb({ last_seq: lastLogSeq })
+});
 
 let currentConfig = null;
 const configModal = new bootstrap.Modal(document.getElementById('configModal'));
@@ -79,8 +83,27 @@ function setupEventListeners() {
 }
 
 function setupSocketListeners() {
-    socket.on('connection_status', (data) => {
-        console.log('Connected to server:', data);
+    // Server-side emits are coalesced into 'batch' frames; replay each to its regular handler
+    socket.on('batch', (data) => {
+        data.events.forEach(([event, payload]) => {
+            socket.listeners(event).forEach((handler) => handler(payload));
+        });
+    });
+
+    socket.on('initial_state', (data) => {
+        console.log('Connected to server:', data.connected);
+        if (data.bot_status) {
+            updateBotStatus(data.bot_status.running);
+        }
+        if (data.trades) {
+            updateOpenTrades(data.trades);
+        }
+        if (data.position) {
+            updatePositionDisplay(data.position);
+        }
+        if (data.logs) {
+            addConsoleLogBatch(data.logs);
+        }
     });
 
     socket.on('bot_status', (data) => {
@@ -99,6 +122,13 @@ function setupSocketListeners() {
         updatePositionDisplay(data);
     });
 
+    socket.on('positions_batch_update', (data) => {
+        // Entries are in modification order, so the last one is the current position state
+        if (data.positions && data.positions.length) {
+            updatePositionDisplay(data.positions[data.positions.length - 1]);
+        }
+    });
+
     socket.on('console_log', (data) => {
         addConsoleLog(data);
     });
@@ -287,26 +317,63 @@ function updateOpenTrades(trades) {
     `).join('');
 }
 
-function addConsoleLog(log) {
-    const consoleOutput = document.getElementById('consoleOutput');
-    
-    if (consoleOutput.querySelector('.text-muted')) {
-        consoleOutput.innerHTML = '';
-    }
-
+function buildConsoleLine(log) {
     const logLine = document.createElement('div');
     logLine.className = `console-line ${log.level}`;
     logLine.innerHTML = `
         <span class="console-timestamp">[${log.timestamp}]</span>
         <span class="console-message">${escapeHtml(log.message)}</span>
     `;
+    return logLine;
+}
+
+function trimConsole(consoleOutput) {
+    while (consoleOutput.children.length > 500) {
+        consoleOutput.removeChild(consoleOutput.firstChild);
+    }
+}
+
+function markLogSeen(log) {
+    // Drops lines already shown, e.g. when a reconnect races with a live emit
+    if (log.seq === undefined) return true;
+    if (lastLogSeq !== null && log.seq <= lastLogSeq) return false;
+    lastLogSeq = log.seq;
+    return true;
+}
+
+function addConsoleLog(log) {
+    if (!markLogSeen(log)) return;
+
+    const consoleOutput = document.getElementById('consoleOutput');
+    
+    if (consoleOutput.querySelector('.text-muted')) {
+        consoleOutput.innerHTML = '';
+    }
 
-    consoleOutput.appendChild(logLine);
+    consoleOutput.appendChild(buildConsoleLine(log));
     consoleOutput.scrollTop = consoleOutput.scrollHeight;
 
-    if (consoleOutput.children.length > 500) {
-        consoleOutput.removeChild(consoleOutput.firstChild);
+    trimConsole(consoleOutput);
+}
+
+function addConsoleLogBatch(logs) {
+    if (!logs) return;
+    logs = logs.filter(markLogSeen);
+    if (logs.length === 0) return;
+
+    const consoleOutput = document.getElementById('consoleOutput');
+
+    if (consoleOutput.querySelector('.text-muted')) {
+        consoleOutput.innerHTML = '';
     }
+
+    // Build off-DOM and attach once so the browser lays out a single time
+    const fragment = document.createDocumentFragment();
+    logs.forEach((log) => fragment.appendChild(buildConsoleLine(log)));
+    consoleOutput.appendChild(fragment);
+    consoleOutput.scrollTop = consoleOutput.scrollHeight;
+
+    trimConsole(consoleOutput);
 }
 
 function escapeHtml(text) {